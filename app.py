@@ -3,7 +3,11 @@ import pandas as pd
 import utils.data_loader as dl
 import utils.chart_generator as cg
 from utils.ai_engine import AIEngine
+from utils.cache import DiskCache, ResponseCache, default_cache_dir
+from utils.timing import PROFILE_ENV, collecting, log_timings
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # -----------------
 # 1. Config & Style
@@ -89,6 +93,26 @@ def insight_card(title, value, interpretation):
         unsafe_allow_html=True
     )
 
+@st.cache_resource
+def get_profile_cache():
+    # One cache per server process, shared by all sessions (and by other processes via disk)
+    return DiskCache(os.path.join(default_cache_dir(), "profiles"), max_bytes=256 * 1024 * 1024)
+
+@st.cache_resource
+def get_response_cache():
+    # Identical prompts from any session reuse one completion; concurrent duplicates share one request
+    return ResponseCache(os.path.join(default_cache_dir(), "llm_responses"), ttl=24 * 3600)
+
+@st.cache_resource
+def get_ai_executor():
+    # Narrative generation runs off the script thread so the dashboard never waits on inference
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="ai-analysis")
+
+DEFAULT_ACTIONS = ["Analyze Trends Over Time", "Compare Categories", "Inspect Distributions"]
+AI_POLL_SECONDS = 0.5
+DROP_DIR = os.environ.get("INSIGHTBRIDGE_DROP_DIR") # Server-side folder whose CSVs can be profiled in place
+UPLOAD_TYPES = [ext.rsplit(".", 1)[1] for ext in dl.INPUT_EXTENSIONS]
+
 # -----------------
 # 2. Main Logic
 # -----------------
@@ -102,23 +126,77 @@ def main():
     
     if 'analysis_state' not in st.session_state:
         st.session_state['analysis_state'] = 'landing'
+    preview = st.empty() # Provisional results while a large file is being profiled
 
     # Sidebar for Reset
     with st.sidebar:
         st.caption("Control Panel")
-        if st.button("New Analysis"):
-            for key in ['summary_data', 'file_name', 'ai_context', 'active_deep_dive']:
+        c_new, c_append = st.columns(2)
+        if c_new.button("New Analysis"):
+            for key in ['profile_state', 'summary_data', 'file_name', 'ai_context', 'ai_future', 'ai_partial', 'ai_timings', 'active_deep_dive']:
                 if key in st.session_state:
                     del st.session_state[key]
             st.rerun()
+        if 'profile_state' in st.session_state:
+            with c_append.popover("Append data"):
+                render_append_panel(preview)
 
-    # Main Router
-    if 'summary_data' not in st.session_state:
-        render_onboarding()
-    else:
-        render_expert_interface()
+        ai_stats = get_response_cache().stats()
+        st.caption(
+            f"AI cache: {ai_stats['memory_hits'] + ai_stats['disk_hits'] + ai_stats['coalesced']} hits, "
+            f"{ai_stats['misses']} upstream calls ({ai_stats['hit_rate']:.0%} hit rate)"
+        )
+        show_diagnostics = st.toggle("Diagnostics", key="show_diagnostics")
+        diagnostics = st.container() # Filled after the page, once this run's chart timings are known
+
+    # Main Router (chart builders report their time to run_timings)
+    with collecting({}) as run_timings:
+        if 'profile_state' not in st.session_state:
+            render_onboarding(preview)
+        else:
+            render_expert_interface()
 
-def render_onboarding():
+    if run_timings:
+        log_timings("render", run_timings)
+    if show_diagnostics:
+        with diagnostics:
+            render_diagnostics(run_timings)
+
+def render_diagnostics(chart_timings):
+    """
+    Sidebar panel: where the time of the last ingest, the AI analysis and this run's charts went.
+    """
+    summary = st.session_state.get('summary_data') or {}
+    ingest = summary.get('ingest', {})
+    sections = [
+        ("Ingest", ingest.get('stages', {})),
+        # Snapshot: the background analysis thread may still be adding stages to this dict
+        ("AI analysis", dict(list(st.session_state.get('ai_timings', {}).items()))),
+        ("Charts (this run)", chart_timings),
+    ]
+    for label, stages in sections:
+        if not stages:
+            continue
+        total = sum(stages.values())
+        st.caption(f"**{label}**: {total:.2f}s")
+        st.dataframe(
+            pd.DataFrame({
+                "stage": list(stages),
+                "seconds": [round(v, 3) for v in stages.values()],
+                "share": [f"{v / total:.0%}" if total else "-" for v in stages.values()],
+            }),
+            hide_index=True, use_container_width=True
+        )
+    if ingest:
+        st.caption(
+            f"{ingest['rows']:,} rows in {ingest['seconds']:.2f}s · {ingest['mb_per_s']:.1f} MB/s · "
+            f"{ingest['backend']} ({ingest.get('format', 'csv')}) · {ingest['workers']} worker(s)"
+            + (" · served from cache" if ingest['cache_hit'] else "")
+        )
+    if os.environ.get(PROFILE_ENV):
+        st.caption(f"cProfile captures are written to `{os.environ[PROFILE_ENV]}`")
+
+def render_onboarding(preview):
     st.markdown("### Executive Business Analytics")
     st.markdown("Turning complex data into clear, strategic decisions. Securely.")
     
@@ -128,9 +206,12 @@ def render_onboarding():
     
     with c1:
         st.markdown("#### Option 1: Upload Data")
-        uploaded_file = st.file_uploader("📂 Drop CSV file", type=["csv"], help="Max 200MB")
+        uploaded_file = st.file_uploader(
+            "📂 Drop data file", type=UPLOAD_TYPES,
+            help="CSV (plain or .gz/.bz2/.zst compressed), Parquet or Arrow/Feather. Max 200MB"
+        )
         if uploaded_file:
-            process_and_load(uploaded_file, uploaded_file.name)
+            process_and_load(uploaded_file, uploaded_file.name, preview)
             
     with c2:
         st.markdown("#### Option 2: No Data?")
@@ -138,32 +219,141 @@ def render_onboarding():
         if st.button("⚡ Try Sample Data", type="primary"):
             with st.spinner("Generating Synthetic Data..."):
                 sample_file = dl.generate_synthetic_csv()
-                process_and_load(sample_file, "Sample Retail Data")
+                process_and_load(sample_file, "Sample Retail Data", preview)
 
-def process_and_load(file_buffer, name):
-    st.session_state['file_name'] = name
-    
-    with st.spinner("🔍 Profiling Data Structure..."):
-        summary = dl.process_uploaded_file(file_buffer)
-        st.session_state['summary_data'] = summary
-        
-    with st.spinner("🧠 Synthesizing Intelligence..."):
-         ai = AIEngine()
-         context = ai.analyze_dataset_context(summary)
-         st.session_state['ai_context'] = context
-    
+    if DROP_DIR:
+        st.markdown("#### Option 3: Server Files")
+        drop_files = dl.list_drop_files(DROP_DIR)
+        if not drop_files:
+            st.caption("The server drop folder has no data files yet.")
+        else:
+            choice = st.selectbox(
+                "🗄️ File in the server drop folder", drop_files, key="drop_file",
+                format_func=lambda f: f"{f[0]} ({f[1] / 1e6:,.1f} MB)"
+            )
+            st.caption("Read in place on the server: no upload and no 200MB limit.")
+            if st.button("📥 Profile Server File"):
+                # A local file is memory-mapped by the profiler instead of being read into memory
+                with open(os.path.join(DROP_DIR, choice[0]), "rb") as f:
+                    process_and_load(f, os.path.basename(choice[0]), preview)
+
+def render_append_panel(preview):
+    """
+    Sidebar popover: merges another file with the same columns into the current analysis.
+    """
+    sources = st.session_state['profile_state']['sources']
+    st.caption("Merged so far: " + ", ".join(f"{s['name'] or 'data'} ({s['rows']:,} rows)" for s in sources))
+    appended = st.file_uploader("➕ New rows (same columns)", type=UPLOAD_TYPES, key="append_file")
+    if appended is not None and st.button("Merge into Analysis", type="primary"):
+        process_and_load(appended, appended.name, preview, append=True)
+
+def process_and_load(file_buffer, name, preview, append=False):
+    provisional = lambda summary: render_provisional(preview, summary)
+    if append:
+        # Only the new rows are read; they are merged into the profile state of the earlier data
+        with st.spinner("➕ Profiling Appended Data..."):
+            state = dl.process_uploaded_file(file_buffer, state=st.session_state['profile_state'], provisional=provisional)
+    else:
+        with st.spinner("🔍 Profiling Data Structure..."):
+            state = dl.process_uploaded_file(file_buffer, cache=get_profile_cache(), provisional=provisional)
+    if state is None:
+        return
+    st.session_state['file_name'] = f"{st.session_state['file_name']} + {name}" if append else name
+    st.session_state['profile_state'] = state
+    # The summary is finalized from the state when the dashboard next reads it (current_summary)
+    st.session_state.pop('summary_data', None)
+
+    # The narrative is generated in the background once the dashboard is up
+    for key in ['ai_context', 'ai_future', 'ai_partial', 'active_deep_dive']:
+        st.session_state.pop(key, None)
     st.rerun()
 
+def render_provisional(slot, summary):
+    """
+    Early look at a file still being profiled: cards and overview charts from the rows read so
+    far. Each newer provisional summary replaces the last; the dashboard takes over at the end.
+    """
+    provisional = summary['provisional']
+    with slot.container():
+        st.info(
+            f"⏳ **Provisional results** from the first {summary['rows']:,} rows ({provisional['fraction']:.0%} of the file read). "
+            "Figures are approximate and will update when profiling completes."
+        )
+        render_analyst_observations(summary)
+        # Keys are per snapshot: every snapshot redraws the charts within the same script run
+        c1, c2 = st.columns(2)
+        fig = cg.create_trend_chart(summary)
+        if fig:
+            c1.plotly_chart(fig, use_container_width=True, key=f"provisional_trend_{provisional['snapshot']}")
+        fig = cg.create_categorical_chart(summary)
+        if fig:
+            c2.plotly_chart(fig, use_container_width=True, key=f"provisional_categories_{provisional['snapshot']}")
+
+def current_summary():
+    """
+    The summary of the session's profile state, finalized on the first read after each load or append.
+    """
+    if 'summary_data' not in st.session_state:
+        st.session_state['summary_data'] = dl.summarize_state(st.session_state['profile_state'])
+    return st.session_state['summary_data']
+
 def render_expert_interface():
-    summary = st.session_state['summary_data']
-    context = st.session_state['ai_context']
-    
+    summary = current_summary()
+    if 'ai_context' not in st.session_state and 'ai_future' not in st.session_state:
+        start_ai_analysis(summary)
+
+    # --- PHASES 1-3: AI narrative (refreshes itself until the background analysis finishes) ---
+    pending = 'ai_context' not in st.session_state
+    st.fragment(render_ai_narrative, run_every=AI_POLL_SECONDS if pending else None)()
+
+    # --- PHASE 4: Strategic Signals (deterministic, shown immediately) ---
+    render_analyst_observations(summary)
+
+    # Deterministic defaults keep the deep dives usable until the AI suggests its own
+    context = st.session_state.get('ai_context', {})
+    render_next_steps(st.empty(), {'recommended_actions': context.get('recommended_actions') or DEFAULT_ACTIONS})
+
+    # Render Active Module
+    if 'active_deep_dive' in st.session_state:
+        render_deep_dive_module(st.session_state['active_deep_dive'], summary)
+
+def start_ai_analysis(summary):
+    sink = {}
+    ai = AIEngine(response_cache=get_response_cache())
+    st.session_state['ai_partial'] = sink
+    st.session_state['ai_timings'] = ai.timings # Filled by the background thread
+    st.session_state['ai_future'] = get_ai_executor().submit(ai.collect_dataset_context, summary, sink)
+
+def render_ai_narrative():
+    future = st.session_state.get('ai_future')
+    if 'ai_context' not in st.session_state and future is not None and future.done():
+        try:
+            st.session_state['ai_context'] = future.result()
+        except Exception as e:
+            print(f"AI analysis failed: {e}")
+            st.session_state['ai_context'] = dict(st.session_state.get('ai_partial', {}))
+        # Full rerun: stops polling and swaps in the AI's recommended next steps
+        st.rerun()
+
+    pending = 'ai_context' not in st.session_state
+    context = st.session_state['ai_context'] if not pending else dict(st.session_state.get('ai_partial', {}))
+    render_assessment_header(st.empty(), context, pending=pending)
+    render_executive_synthesis(st.empty(), context)
+    render_variable_anatomy(st.empty(), context)
+
+def render_assessment_header(slot, context, pending):
     # --- PHASE 1: Domain Assessment ---
-    st.subheader(f"📑 Executive Assessment: {context.get('domain', 'General Purpose')}")
-    
+    with slot.container():
+        st.subheader(f"📑 Executive Assessment: {context.get('domain', 'General Purpose')}")
+        if pending:
+            st.caption("🧠 Synthesizing Intelligence...")
+
+def render_executive_synthesis(slot, context):
     # --- PHASE 2: Executive Synthesis (New) ---
     synthesis = context.get('executive_synthesis', {})
-    if synthesis:
+    if not synthesis:
+        return
+    with slot.container():
         st.markdown(
             """
             <div style="background-color: #f8f9fa; padding: 20px; border-radius: 12px; margin-bottom: 25px; border-left: 5px solid #00d2be;">
@@ -179,9 +369,12 @@ def render_expert_interface():
             st.markdown(f"**💡 Strategic Implication**\n\n{synthesis.get('implication', 'Identifying value levers...')}")
         st.markdown("---")
 
+def render_variable_anatomy(slot, context):
     # --- PHASE 3: Variable Intelligence (New) ---
     var_intel = context.get('variable_intelligence', [])
-    if var_intel:
+    if not var_intel:
+        return
+    with slot.container():
         st.subheader("🧬 Variable Anatomy")
         st.caption("Auto-classification of key drivers within your dataset.")
         
@@ -200,9 +393,9 @@ def render_expert_interface():
             )
         st.markdown("---")
 
-    # --- PHASE 4: Strategic Signals ---
+def render_analyst_observations(summary):
     st.subheader("📌 Analyst Observations")
-    if summary and context:
+    if summary:
         col_a, col_b, col_c = st.columns(3)
         completeness = 100 - (summary['total_missing'] / max(1, summary['rows'] * summary['cols']) * 100)
         
@@ -214,11 +407,12 @@ def render_expert_interface():
             )
 
         with col_b:
-            insight_card(
-                "Metric Dimensionality",
-                f"{summary['cols']} Variables",
-                "Wide scope allows for multi-factor correlation." if summary['cols'] > 10 else "Focused dataset for specific KPI tracking."
-            )
+            pairs = summary.get('correlations', {}).get('top_pairs', [])
+            if pairs and abs(pairs[0]['r']) >= 0.5:
+                interpretation = f"Strongest link: {pairs[0]['a']} ↔ {pairs[0]['b']} (r = {pairs[0]['r']:.2f})."
+            else:
+                interpretation = "Wide scope allows for multi-factor correlation." if summary['cols'] > 10 else "Focused dataset for specific KPI tracking."
+            insight_card("Metric Dimensionality", f"{summary['cols']} Variables", interpretation)
 
         with col_c:
             insight_card(
@@ -228,24 +422,24 @@ def render_expert_interface():
             )
             
     st.markdown("---")
-    
-    # --- PHASE 5: Deep Dives ---
-    st.subheader("🧭 Recommended Next Steps")
 
-    st.write(
-        "Based on the signals in your data, our expert system recommends exploring these specific areas."
-    )
-    
+def render_next_steps(slot, context):
+    # --- PHASE 5: Deep Dives ---
     actions = context.get('recommended_actions', [])
-    cols = st.columns(len(actions))
-    
-    for idx, action in enumerate(actions):
-        if cols[idx].button(f"🔎 {action}", key=f"btn_{idx}", help="Click to analyze"):
-            st.session_state['active_deep_dive'] = action
-    
-    # Render Active Module
-    if 'active_deep_dive' in st.session_state:
-        render_deep_dive_module(st.session_state['active_deep_dive'], summary)
+    if not actions:
+        return
+    with slot.container():
+        st.subheader("🧭 Recommended Next Steps")
+
+        st.write(
+            "Based on the signals in your data, our expert system recommends exploring these specific areas."
+        )
+        
+        cols = st.columns(len(actions))
+        
+        for idx, action in enumerate(actions):
+            if cols[idx].button(f"🔎 {action}", key=f"btn_{idx}", help="Click to analyze"):
+                st.session_state['active_deep_dive'] = action
 
 def render_deep_dive_module(action_name, summary):
     st.markdown("---")
@@ -265,14 +459,36 @@ def render_deep_dive_module(action_name, summary):
     action = action_name.lower()
     
     if "trend" in action or "time" in action:
-        fig = cg.create_trend_chart(summary)
+        # Every combination is precomputed at ingest, so switching never rescans the file
+        c1, c2, c3 = st.columns(3)
+        metric = c1.selectbox("Metric", ["Records"] + list(summary["numeric_stats"].keys()), key="trend_metric")
+        granularity = c2.selectbox("Granularity", dl.TREND_GRANULARITIES, format_func=str.title, key="trend_granularity")
+        agg = c3.selectbox("Aggregate", ["sum", "mean", "min", "max"], key="trend_agg", disabled=metric == "Records")
+        fig = cg.create_trend_chart(summary, metric=metric, granularity=granularity, agg=agg)
         if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.warning("Insufficient time-series data for this view.")
             
+    elif "correl" in action or "relationship" in action or "driver" in action:
+        fig = cg.create_correlation_heatmap(summary)
+        if fig:
+            st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("At least two numeric variables are needed for correlations.")
+
     elif "category" in action or "compare" in action:
-        fig = cg.create_categorical_chart(summary)
+        segments = list(summary.get("segment_stats", {}).keys())
+        if segments and summary["numeric_stats"]:
+            # Served from the group-by cube built at ingest; no second pass over the data
+            metrics = list(summary["numeric_stats"].keys())
+            c1, c2, c3 = st.columns(3)
+            segment = c1.selectbox("Segment", segments, key="segment_col")
+            metric = c2.selectbox("Metric", metrics + ["Records"], key="segment_metric")
+            agg = c3.selectbox("Aggregate", ["sum", "mean"], key="segment_agg", disabled=metric == "Records")
+            fig = cg.create_segment_chart(summary, segment, metric=metric, agg=agg)
+        else:
+            fig = cg.create_categorical_chart(summary)
         if fig:
             st.plotly_chart(fig, use_container_width=True)
         else:
@@ -280,7 +496,29 @@ def render_deep_dive_module(action_name, summary):
         
     else:
         st.info("Displaying general statistical overview.")
-        st.json(summary['numeric_stats'])
+        if summary['numeric_stats']:
+            # Histograms and the row sample are collected at ingest, so these never touch the file
+            c1, c2 = st.columns(2)
+            column = c1.selectbox("Variable", list(summary['numeric_stats'].keys()), key="dist_col")
+            by = c2.selectbox("Split by", ["(none)"] + list(summary.get('segment_stats', {}).keys()), key="dist_by")
+            c1, c2 = st.columns(2)
+            fig = cg.create_histogram_chart(summary, column)
+            if fig:
+                c1.plotly_chart(fig, use_container_width=True)
+            fig = cg.create_box_chart(summary, column, by=None if by == "(none)" else by)
+            if fig:
+                c2.plotly_chart(fig, use_container_width=True)
+
+            df_dist = pd.DataFrame(summary['numeric_stats']).T
+            df_dist = df_dist[['count', 'mean', 'std', 'min', 'p1', 'p25', 'p50', 'p75', 'p95', 'p99', 'max']]
+            st.dataframe(df_dist.astype(float).round(2), use_container_width=True)
+            st.caption("Percentiles are streaming estimates (KLL sketch); min, max and mean are exact.")
+
+            fig = cg.create_correlation_heatmap(summary)
+            if fig:
+                st.plotly_chart(fig, use_container_width=True)
+        else:
+            st.warning("No numeric variables found for distribution analysis.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,100 @@
+"""
+Compares the pandas and Arrow ingest backends of profile_file.
+
+Generates seeded CSV files of the requested sizes, then profiles each one with each backend
+in a fresh subprocess (so peak RSS is not polluted by earlier runs) and prints parse
+throughput and peak RSS per run.
+
+    python benchmarks/compare_ingest_backends.py --sizes 100 250 1000 --dir /tmp/ib_bench
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def write_csv(path, target_mb, seed=7):
+    """
+    Writes a retail-style CSV of roughly target_mb megabytes in 200k-row blocks.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2022-01-01", periods=730).strftime("%Y-%m-%d").to_numpy()
+    categories = np.array(["Electronics", "Home & Garden", "Fashion", "Sports", "Beauty"])
+    regions = np.array(["North America", "Europe", "Asia Pacific", "Latin America"])
+    target = target_mb * 1024 * 1024
+    header = True
+    with open(path, "w") as f:
+        while f.tell() < target:
+            n = 200_000
+            sales = rng.lognormal(5, 1, n).round(2)
+            df = pd.DataFrame({
+                "Date": days[rng.integers(0, days.size, n)],
+                "Category": categories[rng.integers(0, categories.size, n)],
+                "Region": regions[rng.integers(0, regions.size, n)],
+                "Customer ID": np.char.add("C", rng.integers(0, 500_000, n).astype(str)),
+                "Sales Amount": sales,
+                "Profit": (sales * rng.uniform(0.1, 0.4, n)).round(2),
+                "Units": rng.integers(1, 20, n),
+            })
+            df.to_csv(f, index=False, header=header)
+            header = False
+
+def run_one(path, backend):
+    """
+    Child-process body: profiles one file and prints a JSON line with timings and peak RSS.
+    """
+    sys.path.insert(0, ROOT)
+    import utils.data_loader as dl
+
+    with open(path, "rb") as f:
+        started = time.perf_counter()
+        summary = dl.profile_file(f, workers=1, backend=backend)
+        seconds = time.perf_counter() - started
+    size = os.path.getsize(path)
+    print(json.dumps({
+        "backend": summary["ingest"]["backend"],
+        "mb": size / 1e6,
+        "rows": summary["rows"],
+        "seconds": seconds,
+        "mb_per_s": size / 1e6 / seconds,
+        "rows_per_s": summary["rows"] / seconds,
+        # ru_maxrss is KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 250, 1000], help="File sizes in MB")
+    parser.add_argument("--dir", default="/tmp/insightbridge_bench", help="Where generated files are kept")
+    parser.add_argument("--backends", nargs="+", default=["pandas", "arrow"])
+    parser.add_argument("--child", nargs=2, metavar=("PATH", "BACKEND"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_one(*args.child)
+        return
+
+    os.makedirs(args.dir, exist_ok=True)
+    print(f"{'size':>8} {'backend':>8} {'rows':>12} {'sec':>8} {'MB/s':>8} {'rows/s':>12} {'peak RSS MB':>12}")
+    for size_mb in args.sizes:
+        path = os.path.join(args.dir, f"retail_{size_mb}mb.csv")
+        if not os.path.exists(path):
+            write_csv(path, size_mb)
+        for backend in args.backends:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", path, backend],
+                capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1]
+            r = json.loads(out)
+            print(f"{size_mb:>6}MB {r['backend']:>8} {r['rows']:>12,} {r['seconds']:>8.2f} "
+                  f"{r['mb_per_s']:>8.1f} {r['rows_per_s']:>12,.0f} {r['peak_rss_mb']:>12.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Benchmark suite for the whole pipeline: profiling (profile_file), figure construction
+(utils/chart_generator.py) and prompt building (AIEngine._prepare_context), plus one analysis
+round trip against a local stub of the inference endpoint, so nothing leaves the machine.
+
+Datasets are generated once per shape (seeded, so byte-identical across runs) and kept in --dir.
+Each case runs in a fresh subprocess so peak RSS belongs to that case alone. Results are written
+as JSON; pass a previous results file as --baseline to gate on regressions:
+
+    python benchmarks/run_suite.py --suite smoke --out baseline.json
+    python benchmarks/run_suite.py --suite smoke --out latest.json --baseline baseline.json --threshold 0.15
+
+Exits 1 when any gated metric is worse than the baseline by more than the threshold.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# (rows, width, cardinality, dates)
+SUITES = {
+    "smoke": [
+        (10_000, "narrow", "low", "clean"),
+        (10_000, "wide", "low", "clean"),
+        (100_000, "narrow", "high", "messy"),
+    ],
+    "standard": [
+        (10_000, "narrow", "low", "clean"),
+        (1_000_000, "narrow", "low", "clean"),
+        (1_000_000, "narrow", "high", "clean"),
+        (1_000_000, "narrow", "low", "messy"),
+        (1_000_000, "narrow", "high", "messy"),
+        (100_000, "wide", "low", "clean"),
+        (100_000, "wide", "high", "messy"),
+    ],
+}
+SUITES["full"] = SUITES["standard"] + [
+    (1_000_000, "wide", "low", "clean"),
+    (10_000_000, "narrow", "low", "clean"),
+    (50_000_000, "narrow", "low", "clean"),
+]
+WIDE_NUMERIC = 150 # Wide datasets: 1 date + 150 numeric + 49 categorical columns
+WIDE_CATEGORICAL = 49
+BLOCK_CELLS = 4_000_000 # Cells generated per to_csv call, so generation memory stays flat
+METRICS = { # Gated metrics and which direction is better
+    "profile_s": "lower", "charts_s": "lower", "prompt_s": "lower", "ai_s": "lower",
+    "rows_per_s": "higher", "mb_per_s": "higher", "peak_rss_mb": "lower",
+}
+MIN_GATED_SECONDS = 0.05 # Stage timings below this in both runs are too noisy to gate
+
+def case_name(rows, width, cardinality, dates):
+    label = f"{rows // 1_000_000}m" if rows >= 1_000_000 else f"{rows // 1_000}k"
+    return f"{label}-{width}-{cardinality}-{dates}"
+
+def write_dataset(path, rows, width, cardinality, dates, seed=11):
+    """
+    Writes a seeded CSV of the given shape in blocks. High cardinality puts the segment-like
+    columns past SEGMENT_MAX_GROUPS and CATEGORY_MAX_DISTINCT. Messy dates write a tenth of the
+    rows in other formats, with rare missing or junk tokens, so no single strftime format fits
+    the sample and chunks parse dates value by value; the column is still detected as a date.
+    """
+    rng = np.random.default_rng(seed)
+    days = pd.date_range("2021-01-01", periods=1095)
+    clean_days = days.strftime("%Y-%m-%d").to_numpy()
+    messy_days = np.concatenate([days.strftime(f).to_numpy() for f in ("%Y/%m/%d", "%b %d %Y", "%Y-%m-%dT%H:%M:%S")] + [["", "N/A", "unknown"]])
+    levels = 5 if cardinality == "low" else 5_000
+    n_cols = 1 + WIDE_NUMERIC + WIDE_CATEGORICAL if width == "wide" else 7
+    block_rows = max(1, BLOCK_CELLS // n_cols)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        done = 0
+        while done < rows:
+            n = min(block_rows, rows - done)
+            date = clean_days[rng.integers(0, clean_days.size, n)]
+            if dates == "messy":
+                swap = rng.random(n) < 0.1
+                date[swap] = messy_days[rng.integers(0, messy_days.size, swap.sum())]
+            columns = {"Date": date}
+            if width == "wide":
+                numeric = rng.normal(100, 25, (n, WIDE_NUMERIC)).round(3)
+                columns.update({f"m{j:03d}": numeric[:, j] for j in range(WIDE_NUMERIC)})
+                for j in range(WIDE_CATEGORICAL):
+                    columns[f"c{j:02d}"] = np.char.add(f"v{j}_", rng.integers(0, levels + j, n).astype(str))
+            else:
+                sales = rng.lognormal(5, 1, n).round(2)
+                columns.update({
+                    "Category": np.char.add("Cat ", rng.integers(0, levels, n).astype(str)),
+                    "Region": np.char.add("Region ", rng.integers(0, max(4, levels // 2), n).astype(str)),
+                    "Customer ID": np.char.add("C", rng.integers(0, 500_000, n).astype(str)),
+                    "Sales Amount": sales,
+                    "Profit": (sales * rng.uniform(0.1, 0.4, n)).round(2),
+                    "Units": rng.integers(1, 20, n),
+                })
+            pd.DataFrame(columns).to_csv(f, index=False, header=done == 0)
+            done += n
+    os.replace(tmp_path, path)
+
+STUB_COMPLETION = json.dumps({ # Canned analysis the local stub endpoint answers with
+    "domain": "Retail",
+    "executive_synthesis": {"observation": "Benchmark data.", "implication": "None."},
+    "variable_intelligence": [{"column": "Sales Amount", "role": "Metric (KPI)", "description": "Revenue."}],
+    "key_signals": ["a", "b", "c"],
+    "recommended_actions": ["Analyze Trends Over Time", "Compare Categories", "Inspect Distributions"],
+})
+
+def build_figures(summary):
+    """
+    Builds every figure the dashboard can show for a summary and serializes each one, as
+    Streamlit does before sending it to the browser. Returns the number of figures built.
+    """
+    import utils.chart_generator as cg
+
+    figures = [
+        cg.create_trend_chart(summary),
+        cg.create_trend_chart(summary, granularity="month", agg="mean",
+                              metric=next(iter(summary["numeric_stats"]), "Records")),
+        cg.create_categorical_chart(summary),
+        cg.create_correlation_heatmap(summary),
+    ]
+    for segment in list(summary["segment_stats"])[:1]:
+        figures.append(cg.create_segment_chart(summary, segment))
+    for column in list(summary["numeric_stats"])[:1]:
+        figures.append(cg.create_histogram_chart(summary, column))
+        figures.append(cg.create_box_chart(summary, column, by=next(iter(summary["segment_stats"]), None)))
+    figures = [fig for fig in figures if fig is not None]
+    for fig in figures:
+        fig.to_json()
+    return len(figures)
+
+def run_case(path, workers, backend, repeat):
+    """
+    Child-process body: runs every stage `repeat` times on one dataset and prints a JSON line
+    with median stage timings, throughput and peak RSS.
+    """
+    sys.path.insert(0, ROOT)
+    import utils.data_loader as dl
+    from tests.stub_server import StubServer
+    from utils.ai_engine import AIEngine
+    from utils.http_client import InferenceClient
+
+    stub = StubServer(
+        {"body": [{"generated_text": STUB_COMPLETION}]},
+        streaming={"events": [{"token": {"text": STUB_COMPLETION[i:i + 8], "special": False}} for i in range(0, len(STUB_COMPLETION), 8)]},
+    )
+    engine = AIEngine(api_token="offline-benchmark", api_url=stub.url, http_client=InferenceClient())
+    timings = {"profile_s": [], "charts_s": [], "prompt_s": [], "ai_s": []}
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with open(path, "rb") as f:
+                summary = dl.profile_file(f, workers=workers, backend=backend)
+            timings["profile_s"].append(time.perf_counter() - started)
+            assert summary["date_col"] == "Date", f"{path}: Date was not detected as the date column"
+
+            started = time.perf_counter()
+            n_figures = build_figures(summary)
+            timings["charts_s"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            engine._prepare_context(summary)
+            timings["prompt_s"].append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            engine.analyze_dataset_context(summary)
+            list(engine.stream_dataset_context(summary))
+            timings["ai_s"].append(time.perf_counter() - started)
+    finally:
+        stub.close()
+
+    result = {stage: statistics.median(values) for stage, values in timings.items()}
+    size = os.path.getsize(path)
+    result.update({
+        "rows": summary["rows"],
+        "bytes": size,
+        "figures": n_figures,
+        "backend": summary["ingest"]["backend"],
+        "profile_stages": summary["ingest"]["stages"], # Last run's breakdown; reported, not gated
+        "rows_per_s": summary["rows"] / result["profile_s"],
+        "mb_per_s": size / 1e6 / result["profile_s"],
+        # ru_maxrss is KiB on Linux; children cover parallel workers
+        "peak_rss_mb": max(resource.getrusage(who).ru_maxrss for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)) / 1024,
+    })
+    print(json.dumps(result))
+
+def compare(results, baseline, threshold):
+    """
+    Compares two results documents case by case. Returns rows of
+    (case, metric, baseline, current, relative change, regressed) for every shared metric.
+    """
+    rows = []
+    for case, current in results["cases"].items():
+        previous = baseline["cases"].get(case)
+        if previous is None:
+            continue
+        for metric, better in METRICS.items():
+            if metric not in current or metric not in previous or not previous[metric]:
+                continue
+            change = (current[metric] - previous[metric]) / previous[metric]
+            worse = change > threshold if better == "lower" else change < -threshold
+            if metric.endswith("_s") and max(current[metric], previous[metric]) < MIN_GATED_SECONDS:
+                worse = False
+            rows.append((case, metric, previous[metric], current[metric], change, worse))
+    return rows
+
+def environment():
+    try:
+        import pyarrow
+    except ImportError:
+        pyarrow = None
+    sys.path.insert(0, ROOT)
+    import utils.data_loader as dl
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "pyarrow": pyarrow.__version__ if pyarrow else None, # The pandas backend runs without it
+        "profiler_version": dl.PROFILER_VERSION,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suite", choices=sorted(SUITES), default="smoke")
+    parser.add_argument("--cases", nargs="+", help="Only run cases whose name contains one of these strings")
+    parser.add_argument("--dir", default="/tmp/insightbridge_bench", help="Where generated datasets are kept")
+    parser.add_argument("--out", default="bench_results.json", help="Results file to write")
+    parser.add_argument("--baseline", help="Results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change that counts as a regression")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case; the median is reported")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--backend", choices=["auto", "arrow", "pandas"], default="auto")
+    parser.add_argument("--child", nargs=4, metavar=("PATH", "WORKERS", "BACKEND", "REPEAT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        path, workers, backend, repeat = args.child
+        run_case(path, int(workers), backend, int(repeat))
+        return 0
+
+    os.makedirs(args.dir, exist_ok=True)
+    results = {
+        "environment": environment(),
+        "settings": {"suite": args.suite, "workers": args.workers, "backend": args.backend, "repeat": args.repeat},
+        "cases": {},
+    }
+    print(f"{'case':>26} {'rows':>12} {'profile s':>10} {'MB/s':>8} {'rows/s':>12} {'charts s':>9} {'prompt ms':>10} {'ai s':>7} {'RSS MB':>8}")
+    for shape in SUITES[args.suite]:
+        name = case_name(*shape)
+        if args.cases and not any(pattern in name for pattern in args.cases):
+            continue
+        path = os.path.join(args.dir, f"suite_{name}.csv")
+        if not os.path.exists(path):
+            write_dataset(path, *shape)
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", path, str(args.workers), args.backend, str(args.repeat)],
+            capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        r = results["cases"][name] = json.loads(out)
+        print(f"{name:>26} {r['rows']:>12,} {r['profile_s']:>10.2f} {r['mb_per_s']:>8.1f} {r['rows_per_s']:>12,.0f} "
+              f"{r['charts_s']:>9.2f} {r['prompt_s'] * 1000:>10.2f} {r['ai_s']:>7.2f} {r['peak_rss_mb']:>8.0f}")
+
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("settings") != results["settings"]:
+        print(f"warning: baseline settings {baseline.get('settings')} differ from {results['settings']}")
+    rows = compare(results, baseline, args.threshold)
+    regressions = [row for row in rows if row[5]]
+    print(f"\n{len(rows)} metrics compared against {args.baseline} (threshold {args.threshold:.0%})")
+    for case, metric, previous, current, change, _ in regressions:
+        print(f"REGRESSION {case} {metric}: {previous:,.4g} -> {current:,.4g} ({change:+.1%})")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
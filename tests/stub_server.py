@@ -0,0 +1,65 @@
+"""
+Local stand-in for the inference endpoint, shared by the tests and benchmarks/run_suite.py so
+nothing leaves the machine.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubServer:
+    """
+    Threaded local HTTP server that answers each POST with the next scripted reply:
+    {"status", "headers", "body" (JSON-serializable), "delay" (seconds before answering),
+    "events" (server-sent events, streamed "gap" seconds apart)}. The last reply repeats.
+    Requests whose payload asks for a stream get `streaming` instead, when it is given.
+    """
+    def __init__(self, *replies, streaming=None):
+        self.replies = list(replies) or [{}]
+        self.streaming = streaming
+        self.requests = 0
+        lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with lock:
+                    reply = stub.replies[min(stub.requests, len(stub.replies) - 1)]
+                    stub.requests += 1
+                if stub.streaming is not None and payload.get("stream"):
+                    reply = stub.streaming
+                time.sleep(reply.get("delay", 0))
+                self.send_response(reply.get("status", 200))
+                for name, value in reply.get("headers", {}).items():
+                    self.send_header(name, value)
+                if "events" in reply:
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for event in reply["events"]:
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                        self.wfile.flush()
+                        time.sleep(reply.get("gap", 0))
+                    return
+                body = json.dumps(reply.get("body", [{"generated_text": "ok"}])).encode()
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass # The client hung up mid-stream
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/models/stub"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,107 @@
+import json
+import random
+import threading
+import time
+
+import pytest
+
+from utils.ai_engine import AIEngine, IncrementalJSONParser
+from utils.cache import ResponseCache
+from utils.data_loader import generate_synthetic_csv, profile_file
+
+SUMMARY = profile_file(generate_synthetic_csv(rows=200))
+
+class _Completions:
+    """
+    Stands in for the HTTP client: serves the given completions in order.
+    """
+    def __init__(self, *texts):
+        self.texts = list(texts)
+        self.calls = 0
+
+    def post_json(self, url, payload, headers=None, budget=None):
+        self.calls += 1
+        return [{"generated_text": self.texts.pop(0)}]
+
+def test_only_parsed_completions_are_cached(tmp_path):
+    client = _Completions("Sorry, I cannot help with that.", '{"domain": "Retail"}')
+    engine = AIEngine(api_token="token", response_cache=ResponseCache(str(tmp_path)), http_client=client)
+    engine.analyze_dataset_context(SUMMARY) # Falls back; the bad completion must not stick
+    assert engine.analyze_dataset_context(SUMMARY) == {"domain": "Retail"}
+    assert engine.analyze_dataset_context(SUMMARY) == {"domain": "Retail"}
+    assert client.calls == 2
+
+class _Stream:
+    """
+    Stands in for the HTTP client's streaming endpoint: sends `text` as server-sent tokens, slowly.
+    """
+    def __init__(self, text, pause=0.01):
+        self.text = text
+        self.pause = pause
+        self.calls = 0
+
+    def stream_events(self, url, payload, headers=None, budget=None):
+        self.calls += 1
+        for i in range(0, len(self.text), 4):
+            time.sleep(self.pause)
+            yield {"token": {"text": self.text[i:i + 4]}}
+
+def test_concurrent_streams_of_one_prompt_share_one_upstream_call(tmp_path):
+    client = _Stream('{"domain": "Retail", "key_signals": ["a", "b"]}')
+    cache = ResponseCache(str(tmp_path))
+    results = []
+    def analyze():
+        engine = AIEngine(api_token="token", response_cache=cache, http_client=client)
+        results.append(engine.collect_dataset_context(SUMMARY, {}))
+    threads = [threading.Thread(target=analyze) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.calls == 1
+    assert [result["domain"] for result in results] == ["Retail"] * 3
+    assert all(result["key_signals"] == ["a", "b"] for result in results)
+
+def test_followers_stream_themselves_when_the_leader_fails(tmp_path):
+    client = _Stream('{"domain": "Retail"') # Never completes: nothing to share or cache
+    cache = ResponseCache(str(tmp_path))
+    for _ in range(2):
+        AIEngine(api_token="token", response_cache=cache, http_client=client).collect_dataset_context(SUMMARY, {})
+    assert client.calls == 2
+    assert not cache._in_flight
+
+DOCUMENT = json.dumps({
+    "domain": "Retail, \"Q4\" {draft}", # Escaped quotes and braces inside a string
+    "executive_synthesis": {"observation": "Sales rose, then fell.", "implication": "Stock up [early]."},
+    "key_signals": ["a, b", "c\\", "\u00e9t\u00e9"],
+    "score": 0.75,
+}, ensure_ascii=True)
+
+def _feed_all(parser, pieces):
+    fields = []
+    for piece in pieces:
+        fields += parser.feed(piece)
+    return fields
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_parser_handles_tokens_split_anywhere(seed):
+    rng = random.Random(seed)
+    text = "```json\n" + DOCUMENT + "\n```" # Fenced, as models often answer
+    cuts = sorted(rng.sample(range(1, len(text)), 40))
+    pieces = [text[i:j] for i, j in zip([0] + cuts, cuts + [len(text)])]
+    parser = IncrementalJSONParser()
+    assert dict(_feed_all(parser, pieces)) == json.loads(DOCUMENT)
+    assert parser.complete and json.loads(parser.text) == json.loads(DOCUMENT)
+
+def test_incremental_parser_emits_each_member_once_as_it_closes():
+    parser = IncrementalJSONParser()
+    emitted = [parser.feed(ch) for ch in DOCUMENT]
+    keys = [key for fields in emitted for key, _ in fields]
+    assert keys == list(json.loads(DOCUMENT))
+    first = next(i for i, fields in enumerate(emitted) if fields)
+    assert DOCUMENT[first] == "," # The first member is handed out before the rest arrives
+    assert parser.feed('{"late": 1}') == []
+
+def test_incremental_parser_drops_a_broken_member():
+    parser = IncrementalJSONParser()
+    assert _feed_all(parser, ['{"a": 1, "b": tru', 'e-ish, "c": [1, 2]}']) == [("a", 1), ("c", [1, 2])]
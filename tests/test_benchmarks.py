@@ -0,0 +1,27 @@
+import hashlib
+
+from benchmarks import run_suite
+from utils.data_loader import profile_file
+
+def _results(**metrics):
+    return {"cases": {"10k-narrow-low-clean": metrics}}
+
+def test_compare_flags_regressions_in_the_worse_direction_only():
+    baseline = _results(profile_s=1.0, rows_per_s=1000.0, peak_rss_mb=100.0, charts_s=0.01)
+    current = _results(profile_s=1.2, rows_per_s=1500.0, peak_rss_mb=105.0, charts_s=0.04)
+    rows = {metric: worse for _, metric, _, _, _, worse in run_suite.compare(current, baseline, 0.10)}
+    assert rows == {"profile_s": True, "rows_per_s": False, "peak_rss_mb": False, "charts_s": False}
+
+def test_compare_skips_cases_missing_from_the_baseline():
+    current = {"cases": {"new-case": {"profile_s": 9.0}}}
+    assert run_suite.compare(current, _results(profile_s=1.0), 0.10) == []
+
+def test_generated_datasets_are_seeded_and_messy_dates_still_parse(tmp_path):
+    paths = [tmp_path / f"{i}.csv" for i in range(2)]
+    for path in paths:
+        run_suite.write_dataset(str(path), 5000, "narrow", "low", "messy")
+    assert len({hashlib.sha256(path.read_bytes()).hexdigest() for path in paths}) == 1
+    with open(paths[0], "rb") as f:
+        summary = profile_file(f)
+    assert summary["date_col"] == "Date" # Otherwise the messy cases would not time date parsing
+    assert sum(summary["trend_data"].values()) > 0.99 * 5000
@@ -0,0 +1,49 @@
+import os
+import stat
+import time
+
+import pytest
+
+from utils.cache import DiskCache, ResponseCache, default_cache_dir
+
+def test_default_cache_dir_is_per_user(monkeypatch, tmp_path):
+    monkeypatch.delenv("INSIGHTBRIDGE_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert default_cache_dir() == os.path.join(str(tmp_path), "insightbridge")
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_disk_cache_creates_a_private_directory(tmp_path):
+    directory = tmp_path / "cache"
+    cache = DiskCache(str(directory))
+    assert stat.S_IMODE(os.stat(directory).st_mode) & 0o077 == 0
+    cache.put("key", {"a": 1})
+    assert cache.get("key") == {"a": 1}
+
+@pytest.mark.skipif(not hasattr(os, "getuid"), reason="POSIX permissions")
+def test_disk_cache_refuses_a_shared_writable_directory(tmp_path):
+    directory = tmp_path / "shared"
+    directory.mkdir()
+    os.chmod(directory, 0o777)
+    with pytest.raises(PermissionError):
+        DiskCache(str(directory))
+
+def test_promoting_a_disk_entry_keeps_its_expiry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"), ttl=60)
+    created = time.time() - 50
+    cache.disk.put("key", (created, "value"))
+    assert cache.get("key") == "value"
+    assert cache._memory["key"][0] == created # Expires 10s from now, not 60s
+    cache.disk.put("other", (created, "value"))
+    assert cache.get_or_compute("other", lambda: pytest.fail("served from disk")) == "value"
+    assert cache._memory["other"][0] == created
+
+def test_uncacheable_results_are_returned_but_not_stored(tmp_path):
+    cache = ResponseCache(str(tmp_path / "responses"))
+    calls = []
+    def compute():
+        calls.append(1)
+        return "not json"
+    for _ in range(2):
+        assert cache.get_or_compute("key", compute, cacheable=lambda value: False) == "not json"
+    assert len(calls) == 2
+    assert cache.get("key") is None
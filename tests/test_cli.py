@@ -0,0 +1,21 @@
+import os
+
+from utils.cli import build_report, update_state
+from utils.data_loader import generate_synthetic_csv, load_state
+
+def test_rerun_skips_inputs_already_in_the_state(tmp_path):
+    paths = [str(tmp_path / f"day{i}.csv") for i in range(2)]
+    for i, path in enumerate(paths):
+        generate_synthetic_csv(seed=i, rows=300, out=path)
+    state_path = str(tmp_path / "sales.state")
+    assert all("ingest" in entry for entry in update_state(paths[:1], state_path, str(tmp_path), "json"))
+
+    results = update_state(paths, state_path, str(tmp_path), "json")
+    assert "skipped" in results[0] and "ingest" in results[1]
+    assert load_state(state_path)["partial"]["rows"] == 600
+    report = build_report(results, 1.0)
+    assert (report["succeeded"], report["skipped"], report["failed"]) == (1, 1, 0)
+
+    os.utime(paths[0], ns=(0, 0)) # Touched since: appended again as new data
+    assert "ingest" in update_state(paths[:1], state_path, str(tmp_path), "json")[0]
+    assert load_state(state_path)["partial"]["rows"] == 900
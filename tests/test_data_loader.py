@@ -0,0 +1,344 @@
+import bz2
+import gzip
+import io
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils.data_loader as dl
+from utils.cache import DiskCache
+
+BACKENDS = ["arrow", "pandas"]
+
+def _profile(data, **kwargs):
+    return dl.profile_file(io.BytesIO(data), **kwargs)
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_blank_header_cell(backend, workers):
+    # df.to_csv() with its default index writes a header that starts with an empty cell
+    data = b",x\n" + b"".join(f"{i},{i * 2}\n".encode() for i in range(100))
+    summary = _profile(data, workers=workers, backend=backend)
+    assert summary["rows"] == 100
+    assert summary["numeric_stats"]["Unnamed: 0"]["sum"] == sum(range(100))
+    assert summary["numeric_stats"]["x"]["sum"] == 2 * sum(range(100))
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_duplicate_header(backend, workers):
+    data = b"x,x,label\n" + b"".join(f"{i},{i + 1},L{i % 3}\n".encode() for i in range(100))
+    summary = _profile(data, workers=workers, backend=backend)
+    assert summary["numeric_stats"]["x"]["sum"] == sum(range(100))
+    assert summary["numeric_stats"]["x.1"]["sum"] == sum(range(1, 101))
+    assert summary["categorical_stats"]["label"]["count"] == 100
+
+def _quoted_csv(rows):
+    lines = [b"id,note,value\n"]
+    for i in range(rows):
+        note = f'"line one of {i}\nline two, with a comma\n"' if i % 3 == 0 else f"plain {i}"
+        lines.append(f"{i},{note},{i * 0.5}\n".encode())
+    return b"".join(lines)
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_parallel_split_respects_quoted_line_breaks(backend):
+    data = _quoted_csv(3000)
+    sequential = _profile(data, workers=1, backend=backend)
+    parallel = _profile(data, workers=4, backend=backend)
+    assert parallel["ingest"]["workers"] == 4
+    assert parallel["rows"] == sequential["rows"] == 3000
+    assert parallel["numeric_stats"]["value"]["sum"] == sequential["numeric_stats"]["value"]["sum"]
+
+@pytest.mark.parametrize("cores", [1, 2])
+def test_default_workers_need_more_than_one_core(cores, monkeypatch):
+    monkeypatch.setattr(dl, "_usable_cores", lambda: cores)
+    monkeypatch.setattr(dl, "PARALLEL_MIN_BYTES", 1024)
+    summary = _profile(_quoted_csv(3000), backend="pandas")
+    assert summary["ingest"]["workers"] == cores
+    assert summary["rows"] == 3000
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_progress_follows_bytes_consumed(backend, monkeypatch):
+    monkeypatch.setattr(dl, "CHUNK_SIZE", 5000)
+    monkeypatch.setattr(dl, "ARROW_BLOCK_SIZE", 16 * 1024) # Arrow reads ~30 blocks ahead
+    data = b"id,value\n" + b"".join(f"{i},{i * 0.5}\n".encode() for i in range(200_000)) # Larger than one parser read
+    reports = []
+    summary = _profile(data, workers=1, backend=backend, progress=lambda fraction, text: reports.append((fraction, text)))
+    fractions = [fraction for fraction, _ in reports]
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert len(set(fractions[1:-1])) > 5 and max(fractions[:-1]) <= 0.99 # Moves chunk by chunk, never done early
+    assert any("rows/s" in text and "MB/s" in text for _, text in reports)
+    ingest = summary["ingest"]
+    assert (ingest["bytes"], ingest["rows"]) == (len(data), 200_000)
+    assert ingest["mb_per_s"] == pytest.approx(len(data) / ingest["seconds"] / 1e6)
+
+def test_split_byte_ranges_ends_on_record_boundaries():
+    data = _quoted_csv(500)
+    start = data.index(b"\n") + 1
+    ranges = dl._split_byte_ranges(data, start, 16)
+    assert ranges[0][0] == start and ranges[-1][1] == len(data)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert data[start:end].count(b'"') % 2 == 0
+
+def test_parallel_falls_back_to_sequential_on_unparseable_range(monkeypatch):
+    # Without quote tracking the ranges are cut inside quoted fields, as a stray quote would cause
+    monkeypatch.setattr(dl, "_count_quotes", lambda data, start, end: 0)
+    data = _quoted_csv(3000)
+    summary = _profile(data, workers=4, backend="pandas")
+    assert summary["ingest"]["workers"] == 1
+    assert summary["ingest"]["stages"]["retries"] > 0
+    assert summary["rows"] == 3000
+
+def test_mapped_range_reads_prefix_then_its_range(tmp_path, monkeypatch):
+    monkeypatch.setattr(dl, "MAPPED_RELEASE_BYTES", 4096) # Release pages while reading
+    data = bytes(range(256)) * 200
+    path = tmp_path / "data.bin"
+    path.write_bytes(data)
+    with dl.MappedRange(str(path), 1000, 40_000, prefix=b"header\n") as reader:
+        read = b"".join(iter(lambda: reader.read(777), b""))
+        assert reader.bytes_read == len(read)
+    assert read == b"header\n" + data[1000:40_000]
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_local_file_profiles_like_an_upload(tmp_path, workers):
+    data = _quoted_csv(3000)
+    path = tmp_path / "data.csv"
+    path.write_bytes(data)
+    with open(path, "rb") as f:
+        mapped = dl.profile_file(f, workers=workers, backend="pandas")
+    uploaded = _profile(data, workers=workers, backend="pandas")
+    assert mapped["ingest"]["name"] == str(path)
+    assert mapped["rows"] == uploaded["rows"] == 3000
+    assert mapped["numeric_stats"] == uploaded["numeric_stats"]
+
+def test_drop_folder_lists_data_files_recursively(tmp_path):
+    (tmp_path / "2024").mkdir()
+    for name in ("a.csv", "2024/b.CSV.GZ", "2024/c.parquet", "notes.txt", "d.csv.tmp"):
+        (tmp_path / name).write_bytes(b"x\n1\n")
+    assert dl.list_drop_files(str(tmp_path)) == [
+        (os.path.join("2024", "b.CSV.GZ"), 4), (os.path.join("2024", "c.parquet"), 4), ("a.csv", 4)
+    ]
+
+def test_trend_keeps_only_observed_days():
+    trend = dl._new_trend(1)
+    days = np.array([19000, 19000, 19001, 2932896], dtype=np.int64) # Last one is 9999-12-31
+    dl._add_days(trend, days, np.array([[1.0], [2.0], [np.nan], [4.0]]))
+    other = dl._new_trend(1)
+    dl._add_days(other, np.array([18999, 19001], dtype=np.int64), np.array([[5.0], [6.0]]))
+    dl._merge_trend(trend, other)
+    assert trend["days"].tolist() == [18999, 19000, 19001, 2932896]
+    assert trend["records"].tolist() == [1, 2, 2, 1]
+    assert trend["sum"][:, 0].tolist() == [5.0, 3.0, 6.0, 4.0]
+    assert trend["count"][:, 0].tolist() == [1, 2, 1, 1]
+    assert list(dl._trend_to_dict(trend))[-1] == "9999-12-31"
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_offset_aware_dates_bucket_by_local_day_on_every_backend(workers):
+    data = (
+        b"Date,Sales\n"
+        b"2024-01-02T01:00:00+02:00,1\n" # 2024-01-01 in UTC
+        b"2024-01-02T23:30:00+02:00,2\n"
+        b"2024-01-03T01:30:00+02:00,4\n" # 2024-01-02 in UTC
+    )
+    trends = {backend: _profile(data, workers=workers, backend=backend)["trend_data"] for backend in BACKENDS}
+    assert trends["arrow"] == trends["pandas"] == {"2024-01-02": 2, "2024-01-03": 1}
+
+@pytest.mark.parametrize("date_format", ["%Y-%m-%d %H:%M", None])
+def test_day_numbers_match_per_row_parsing(date_format):
+    values = pd.Series(["2024-03-01 10:00", "2024-03-01 23:59", None, "garbage", "1970-01-02 00:00"] * 200)
+    days, valid = dl._day_numbers(values, date_format)
+    expected = pd.to_datetime(values, format=date_format or "mixed", errors="coerce")
+    assert valid.tolist() == expected.notna().tolist()
+    assert days[valid].tolist() == (expected[valid].dt.normalize() - pd.Timestamp(0)).dt.days.tolist()
+    assert days[4] == 1
+
+def test_date_format_parses_the_whole_sample_once(monkeypatch):
+    days = pd.Series(pd.date_range("2021-01-01", periods=5000).strftime("%Y-%m-%d"))
+    days[::50] = None
+    days[1] = "Jan 02 2021" # Guessed first among the distinct values, but fits too few of them
+    full_parses = []
+    to_datetime = pd.to_datetime
+    def counting(values, **kwargs):
+        full_parses.extend([kwargs["format"]] if len(values) == days.count() else [])
+        return to_datetime(values, **kwargs)
+    monkeypatch.setattr(pd, "to_datetime", counting)
+    assert dl._infer_date_format(days) == "%Y-%m-%d"
+    assert full_parses == ["%Y-%m-%d"]
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_mixed_format_dates_parse_per_value(backend):
+    data = b"Order Date,Sales\n2024-01-02,1\nJan 03 2024,2\n2024/01/03,4\n,8\n"
+    summary = _profile(data, backend=backend)
+    assert summary["date_col"] == "Order Date"
+    assert summary["trend_data"] == {"2024-01-02": 1, "2024-01-03": 2}
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("workers", [1, 2])
+def test_segment_cube_matches_groupby(backend, workers):
+    data = b"seg,a,b\n" + b"".join(
+        f"{['x', 'y', '', 'z'][i % 4]},{i if i % 5 else ''},{i * 0.5}\n".encode() for i in range(2000)
+    )
+    summary = _profile(data, workers=workers, backend=backend)
+    assert "retries" not in summary["ingest"]["stages"]
+    cube = summary["segment_stats"]["seg"]
+    assert cube["values"] == ["x", "y", "z"] # Largest first, missing keys dropped
+    df = pd.read_csv(io.BytesIO(data))
+    grouped = df.groupby("seg")
+    assert cube["rows"] == grouped.size()[cube["values"]].tolist()
+    for col in ("a", "b"):
+        assert cube["metrics"][col]["count"] == grouped[col].count()[cube["values"]].tolist()
+        assert cube["metrics"][col]["sum"] == pytest.approx(grouped[col].sum()[cube["values"]].tolist())
+
+def test_chunked_moments_match_one_pass_on_large_magnitudes():
+    rng = np.random.default_rng(4)
+    block = rng.normal(size=(3000, 3)) * [1.0, 1e-3, 50.0] + [0.0, 1e9, -7.0]
+    block[rng.random(block.shape) < 0.1] = np.nan
+    block[:, 2] = np.nan # An all-missing column
+    moments = dl._new_moments(3)
+    for part in np.array_split(block, 7):
+        dl._combine_moments(moments, dl._reduce_numeric_block(part))
+    present = ~np.isnan(block[:, :2])
+    assert moments["count"].tolist() == present.sum(axis=0).tolist() + [0]
+    assert moments["missing"].tolist() == (~present).sum(axis=0).tolist() + [3000]
+    assert np.allclose(moments["min"][:2], np.nanmin(block[:, :2], axis=0))
+    assert np.allclose(moments["max"][:2], np.nanmax(block[:, :2], axis=0))
+    assert np.allclose(moments["mean"][:2], np.nanmean(block[:, :2], axis=0))
+    # A naive sum-of-squares variance loses every digit of the 1e-3 spread around 1e9
+    assert np.allclose(moments["m2"][:2] / (moments["count"][:2] - 1), np.nanvar(block[:, :2], axis=0, ddof=1), rtol=1e-6)
+    assert moments["min"][2] == np.inf and moments["max"][2] == -np.inf
+
+@pytest.mark.parametrize("missing", [False, True])
+def test_correlations_match_pairwise_complete_pearson(missing):
+    rng = np.random.default_rng(7)
+    block = rng.normal(size=(500, 4)) * [1.0, 10.0, 1e3, 0.1] + 1e6
+    block[:, 1] += block[:, 0] * 5
+    if missing:
+        block[rng.random(block.shape) < 0.2] = np.nan
+    products = dl._new_cross_products(4)
+    for part in np.array_split(block, 3): # Several chunks, as during ingest
+        dl._add_cross_products(products, part, np.nanmean(block[:50], axis=0))
+    result = dl._correlations(products, list("abcd"))
+    expected = pd.DataFrame(block, columns=list("abcd")).corr().to_numpy()
+    assert np.allclose(result["matrix"], expected)
+
+def test_local_file_cache_key_reads_no_bytes(tmp_path, monkeypatch):
+    path = tmp_path / "data.csv"
+    path.write_bytes(b"Sales\n" + b"".join(f"{i}\n".encode() for i in range(100)))
+    cache = DiskCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(dl, "stream_digest", lambda *args: pytest.fail("hashed a local file"))
+    hits = []
+    for touch in (None, None, (0, 0)): # Third run: same bytes, new mtime
+        if touch:
+            os.utime(path, ns=touch)
+        with open(path, "rb") as f:
+            hits.append(dl.profile_file(f, cache=cache)["ingest"].get("cache_hit", False))
+    assert hits == [False, True, False]
+
+def test_synthetic_data_is_seeded_and_streams_wide_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(dl, "SYNTHETIC_CHUNK_ROWS", 700)
+    kwargs = dict(seed=9, rows=2000, extra_columns=30, end_date="2024-06-30")
+    path = tmp_path / "wide.csv"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", pd.errors.PerformanceWarning) # A fragmented frame warns
+        dl.generate_synthetic_csv(out=str(path), **kwargs)
+    assert path.read_bytes() == dl.generate_synthetic_csv(**kwargs).getvalue()
+    df = pd.read_csv(path)
+    assert len(df) == 2000 and df.shape[1] == 5 + 30 # One header for all three chunks
+    assert sum(c.startswith("Attribute") for c in df.columns) == 10
+    assert df["Date"].max() == "2024-06-30"
+    assert 0.005 < df["Metric 1"].isna().mean() < 0.05
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_provisional_summaries_grow_toward_the_final_one(workers, monkeypatch):
+    monkeypatch.setattr(dl, "CHUNK_SIZE", 500)
+    monkeypatch.setattr(dl, "PROVISIONAL_FIRST_CHUNKS", 2)
+    monkeypatch.setattr(dl, "PROVISIONAL_INTERVAL", 0.0) # Publish at every chance
+    monkeypatch.setattr(dl, "PROVISIONAL_OVERHEAD", 1.0)
+    data = _quoted_csv(6000)
+    snapshots = []
+    summary = _profile(data, workers=workers, backend="pandas", provisional=snapshots.append)
+    assert "provisional" not in summary and summary["rows"] == 6000
+    assert len(snapshots) >= 2
+    assert [s["provisional"]["snapshot"] for s in snapshots] == list(range(1, len(snapshots) + 1))
+    rows = [s["rows"] for s in snapshots]
+    assert rows == sorted(rows) and rows[-1] <= 6000
+    assert all(0 < s["provisional"]["fraction"] <= 1 for s in snapshots)
+
+def test_provisional_summaries_of_an_append_include_the_state(monkeypatch):
+    monkeypatch.setattr(dl, "CHUNK_SIZE", 500)
+    monkeypatch.setattr(dl, "PROVISIONAL_FIRST_CHUNKS", 1)
+    state = dl.profile_state(io.BytesIO(_quoted_csv(1000)), workers=1)
+    snapshots = []
+    dl.profile_state(io.BytesIO(_quoted_csv(3000)), workers=1, state=state, provisional=snapshots.append)
+    assert snapshots and all(1000 < s["rows"] <= 4000 for s in snapshots)
+    assert state["partial"]["rows"] == 1000 # The given state is left unchanged
+
+def _retail_frame(rows=3000):
+    return pd.DataFrame({
+        "Date": pd.date_range("2024-01-01", periods=rows, freq="h").strftime("%Y-%m-%d %H:%M"),
+        "Region": [f"R{i % 4}" for i in range(rows)],
+        "Sales": np.arange(rows) * 1.5,
+        "Units": np.arange(rows) % 7,
+    })
+
+def _comparable(summary):
+    return (summary["rows"], summary["date_col"], summary["numeric_stats"], summary["trend_data"],
+            summary["categorical_stats"]["Region"]["top"])
+
+@pytest.mark.parametrize("codec", ["gzip", "bz2", "zstd"])
+def test_compressed_csv_profiles_like_plain(codec):
+    data = _retail_frame().to_csv(index=False).encode()
+    if codec == "zstd":
+        pa = pytest.importorskip("pyarrow") # The loader's fallback codec when zstandard is missing
+        packed = pa.compress(data, codec="zstd", asbytes=True)
+    else:
+        packed = {"gzip": gzip, "bz2": bz2}[codec].compress(data)
+    summary = _profile(packed, workers=4)
+    assert (summary["ingest"]["format"], summary["ingest"]["workers"]) == (codec, 1) # Cannot be split at offsets
+    assert _comparable(summary) == _comparable(_profile(data))
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_input_profiles_like_csv_and_skips_nested_columns(fmt):
+    pa = pytest.importorskip("pyarrow")
+    frame = _retail_frame()
+    table = pa.Table.from_pandas(frame, preserve_index=False).append_column(
+        "tags", pa.array([[i, i + 1] for i in range(len(frame))]) # Nested: not profiled
+    )
+    buffer = io.BytesIO()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        pq.write_table(table, buffer, row_group_size=700)
+    else:
+        import pyarrow.feather as feather
+        feather.write_feather(table, buffer)
+    summary = _profile(buffer.getvalue())
+    assert summary["ingest"]["format"] == fmt
+    assert "tags" not in summary["numeric_stats"] and "tags" not in summary["categorical_stats"]
+    assert _comparable(summary) == _comparable(_profile(frame.to_csv(index=False).encode()))
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_append_with_reordered_columns(backend):
+    rows = range(400)
+    first = b"Date,Sales,Profit,Region\n" + b"".join(f"2024-01-{i % 28 + 1:02d},{i},{-i},R{i % 3}\n".encode() for i in rows)
+    second = b"Date,Profit,Sales,Region\n" + b"".join(f"2024-02-{i % 28 + 1:02d},{-i},{i},R{i % 3}\n".encode() for i in rows)
+    state = dl.profile_state(io.BytesIO(first), workers=1, backend=backend)
+    state = dl.profile_state(io.BytesIO(second), workers=1, backend=backend, state=state)
+    stats = dl.summarize_state(state)["numeric_stats"]
+    assert (stats["Sales"]["min"], stats["Sales"]["max"], stats["Sales"]["sum"]) == (0, 399, 2 * sum(rows))
+    assert (stats["Profit"]["min"], stats["Profit"]["max"], stats["Profit"]["sum"]) == (-399, 0, -2 * sum(rows))
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_late_stray_token_costs_at_most_one_restart(backend, monkeypatch):
+    monkeypatch.setattr(dl, "CHUNK_SIZE", 500)
+    monkeypatch.setattr(dl, "ARROW_BLOCK_SIZE", 4096)
+    monkeypatch.setattr(dl, "SCHEMA_SAMPLE_ROWS", 1000)
+    monkeypatch.setattr(dl, "SCHEMA_WINDOWS", 0) # The sample must not see the token
+    data = b"id,value\n" + b"".join(f"{i},{i * 0.5}\n".encode() for i in range(3000)) + b"3000,oops\n"
+    summary = _profile(data, workers=1, backend=backend)
+    assert summary["ingest"]["backend"] == "pandas" # Never the loose mode
+    assert ("retries" in summary["ingest"]["stages"]) == (backend == "arrow")
+    assert summary["numeric_stats"]["value"]["count"] == 3000
+    assert summary["numeric_stats"]["value"]["sum"] == sum(i * 0.5 for i in range(3000))
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+import requests
+
+from tests.stub_server import StubServer
+from utils.cache import ResponseCache
+from utils.http_client import InferenceClient
+
+@pytest.fixture
+def stub():
+    servers = []
+    def start(*replies):
+        servers.append(StubServer(*replies))
+        return servers[-1]
+    yield start
+    for server in servers:
+        server.close()
+
+def test_open_stream_holds_its_concurrency_permit(stub):
+    events = [{"token": {"text": str(i)}} for i in range(20)]
+    server = stub({"events": events, "gap": 0.05}, {})
+    client = InferenceClient(max_concurrency=1)
+    stream = client.stream_events(server.url, {})
+    assert next(stream) == events[0]
+    with pytest.raises(requests.Timeout):
+        client.post_json(server.url, {}, budget=0.3) # The stream still occupies the only slot
+    stream.close()
+    assert client.post_json(server.url, {}, budget=2) == [{"generated_text": "ok"}]
+
+def test_retries_transient_statuses_up_to_max_retries(stub):
+    server = stub({"status": 503, "headers": {"Retry-After": "0"}}, {"status": 503, "headers": {"Retry-After": "0"}}, {})
+    assert InferenceClient().post_json(server.url, {}) == [{"generated_text": "ok"}]
+    assert server.requests == 3
+
+    server = stub({"status": 503, "headers": {"Retry-After": "0"}})
+    with pytest.raises(requests.HTTPError):
+        InferenceClient(max_retries=2).post_json(server.url, {})
+    assert server.requests == 3 # The first attempt plus two retries
+
+def test_waits_as_long_as_retry_after_asks(stub):
+    server = stub({"status": 503, "headers": {"Retry-After": "1"}}, {})
+    started = time.monotonic()
+    InferenceClient(backoff_base=0.001).post_json(server.url, {})
+    assert time.monotonic() - started >= 0.9
+    assert server.requests == 2
+
+def test_gives_up_when_retry_after_exceeds_the_budget(stub):
+    server = stub({"status": 503, "headers": {"Retry-After": "5"}}, {})
+    started = time.monotonic()
+    with pytest.raises(requests.HTTPError):
+        InferenceClient().post_json(server.url, {}, budget=1)
+    assert time.monotonic() - started < 0.9 # Fails at once instead of sleeping into the deadline
+    assert server.requests == 1
+
+def test_slow_responses_end_at_the_budget(stub):
+    server = stub({"delay": 3})
+    started = time.monotonic()
+    with pytest.raises(requests.Timeout):
+        InferenceClient().post_json(server.url, {}, budget=0.5)
+    assert time.monotonic() - started < 1.5
+
+def test_concurrent_identical_requests_share_one_upstream_call(stub, tmp_path):
+    server = stub({"delay": 0.3})
+    client = InferenceClient()
+    cache = ResponseCache(str(tmp_path))
+    results = []
+    def ask():
+        results.append(cache.get_or_compute("prompt", lambda: client.post_json(server.url, {})))
+    threads = [threading.Thread(target=ask) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [[{"generated_text": "ok"}]] * 8
+    assert server.requests == 1
+    assert cache.stats()["coalesced"] == 7
@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.sketches import CategoricalSketch, HyperLogLog, QuantileSketch, ReservoirSample, StreamingHistogram
+
+def _zipf_column(n, seed=3):
+    # A few heavy values over a long tail of rare IDs, like real categorical data
+    rng = np.random.default_rng(seed)
+    return pd.Series(np.char.add("v", rng.zipf(1.3, n).astype(str)))
+
+def test_merged_heavy_hitters_stay_within_their_error_bound():
+    values = _zipf_column(60_000)
+    merged = CategoricalSketch(capacity=64)
+    for start in range(0, len(values), 10_000): # One sketch per chunk or worker
+        sketch = CategoricalSketch(capacity=64)
+        sketch.update(values[start:start + 10_000])
+        merged.merge(sketch)
+    result = merged.finalize(top_n=10)
+    truth = values.value_counts()
+    assert result["count"] == len(values)
+    assert not result["distinct_exact"]
+    assert [entry["value"] for entry in result["top"][:5]] == truth.index[:5].tolist()
+    for entry in result["top"]:
+        assert entry["count"] <= truth[entry["value"]] <= entry["count"] + entry["error"]
+
+def test_sketch_under_capacity_is_exact():
+    values = pd.Series(["a", "b", "a", None, "c", "a"] * 10)
+    merged = CategoricalSketch(capacity=8)
+    for part in (values[:25], values[25:]):
+        sketch = CategoricalSketch(capacity=8)
+        sketch.update(part.astype("category")) # Each chunk has its own categories
+        merged.merge(sketch)
+    result = merged.finalize()
+    assert result["distinct_exact"] and result["distinct"] == 3
+    assert result["top"][0] == {"value": "a", "count": 30, "error": 0}
+    assert result["count"] == 50
+
+def test_hyperloglog_merge_matches_one_pass():
+    values = pd.Series(np.arange(200_000).astype(str))
+    whole, left, right = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    whole.update(values)
+    left.update(values[:120_000])
+    right.update(values[80_000:]) # Overlapping halves: duplicates must not count twice
+    assert left.merge(right).estimate() == whole.estimate()
+    assert abs(whole.estimate() - 200_000) / 200_000 < 0.03
+
+@pytest.mark.parametrize("parts", [1, 8])
+def test_merged_quantiles_stay_within_rank_error(parts):
+    rng = np.random.default_rng(5)
+    values = rng.lognormal(5, 1, 400_000)
+    values[::97] = np.nan
+    merged = QuantileSketch(k=200, seed=0)
+    for idx, part in enumerate(np.array_split(values, parts)):
+        sketch = QuantileSketch(k=200, seed=idx + 1)
+        for batch in np.array_split(part, 5): # Chunks within a worker
+            sketch.update(batch)
+        merged.merge(sketch)
+    clean = np.sort(values[~np.isnan(values)])
+    assert merged.count == clean.size
+    qs = [0.01, 0.25, 0.5, 0.95, 0.99]
+    ranks = np.searchsorted(clean, merged.quantiles(qs)) / clean.size
+    assert np.all(np.abs(ranks - qs) < 2 / 200) # Rank error is about 1.7 / k
+    assert sum(level.size for level in merged.levels) < 4 * 200
+
+def test_empty_quantile_sketch():
+    sketch = QuantileSketch()
+    sketch.update([np.nan])
+    assert np.isnan(sketch.merge(QuantileSketch()).quantiles([0.5])[0])
+
+def test_reservoir_keeps_the_smallest_keys_across_merges():
+    frame = pd.DataFrame({"x": np.arange(10_000)})
+    parts = []
+    for idx, start in enumerate(range(0, 10_000, 2500)):
+        part = ReservoirSample(capacity=300, seed=idx)
+        for chunk_start in range(start, start + 2500, 500):
+            part.update(frame[chunk_start:chunk_start + 500])
+        parts.append(part)
+    merged = ReservoirSample(capacity=300)
+    for part in parts:
+        merged.merge(part)
+    # Bottom-k over every key drawn: replay the draws to know which rows should have won
+    keys = np.concatenate([np.random.default_rng(idx).random(2500) for idx in range(4)])
+    assert sorted(merged.sample()["x"]) == sorted(np.argsort(keys)[:300])
+    assert merged.keys.size == 300
+
+def test_reservoir_skips_rows_that_cannot_enter():
+    sample = ReservoirSample(capacity=100, seed=1)
+    sample.update(pd.DataFrame({"x": np.arange(100_000)}))
+    rows, keys = sample.select(10_000)
+    assert len(rows) < 100 # Only rows beating the current largest key (~1e-3) are built
+    assert np.all(keys < sample.keys.max())
+
+def test_histogram_widens_without_losing_counts():
+    rng = np.random.default_rng(2)
+    values = rng.normal(0, 1, 20_000)
+    hist = StreamingHistogram(bins=32)
+    for batch in (values[:100], values[100:] * 40, [np.nan, np.inf]): # Later batches outgrow the first range
+        hist.update(batch)
+    other = StreamingHistogram(bins=32, value_range=(-500.0, 500.0))
+    other.update(values * 10)
+    hist.merge(other)
+    result = hist.finalize()
+    assert sum(result["counts"]) == 40_000
+    edges = np.asarray(result["edges"])
+    assert edges[0] <= min(values[:100].min(), values[100:].min() * 40) and edges[-1] >= values[100:].max() * 40
+    assert np.allclose(np.diff(edges), hist.width)
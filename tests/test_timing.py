@@ -0,0 +1,22 @@
+import os
+import pstats
+
+from utils.timing import PROFILE_ENV, profiled
+
+@profiled("inner")
+def _inner():
+    return sum(range(1000))
+
+@profiled("outer")
+def _outer():
+    return _inner()
+
+def test_nested_profiled_call_stays_in_the_outer_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv(PROFILE_ENV, str(tmp_path))
+    assert _outer() == sum(range(1000))
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and files[0].startswith("outer-")
+    functions = {name for _, _, name in pstats.Stats(str(tmp_path / files[0])).stats}
+    assert "_inner" in functions
+    assert _inner() == sum(range(1000)) # Still captured on its own once the outer call is done
+    assert sorted(name.split("-")[0] for name in os.listdir(tmp_path)) == ["inner", "outer"]
@@ -1,33 +1,99 @@
-import requests
 import streamlit as st
-import time
+import asyncio
 import json
 import random
+import hashlib
+from utils.http_client import get_default_client
+from utils.timing import log_timings, profiled, span
+
+DEFAULT_API_URL = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+CONTEXT_FIELDS = ("domain", "executive_synthesis", "variable_intelligence", "key_signals", "recommended_actions")
 
 class AIEngine:
-    def __init__(self):
-        # Retrieve API Token from Streamlit Secrets
-        self.api_token = st.secrets.get("HF_API_TOKEN", None)
+    def __init__(self, api_token=None, api_url=None, response_cache=None, http_client=None):
+        # Retrieve API Token from Streamlit Secrets unless one is passed in
+        self.api_token = api_token or _read_secret("HF_API_TOKEN")
         # Using a reliable model (Mistral or similar instruct model)
-        self.api_url = "https://api-inference.huggingface.co/models/mistralai/Mistral-7B-Instruct-v0.2"
+        self.api_url = api_url or DEFAULT_API_URL
+        # Optional utils.cache.ResponseCache shared across sessions
+        self.response_cache = response_cache
+        # Pooled, retrying client shared by every engine in the process
+        self.http_client = http_client or get_default_client()
+        # {stage: seconds} of the latest analysis; cleared, never replaced, so readers can hold on to it
+        self.timings = {}
 
+    @profiled("ai_analysis")
     def analyze_dataset_context(self, summary_data):
         """
         Performs the Phase 1 assessment: Domain, Purpose, Signals.
         Returns a structured dictionary with DEEP intelligence.
         """
-        # Prepare the context for the LLM
-        context = self._prepare_context(summary_data)
-        
+        self.timings.clear()
+        try:
+            # Prepare the context for the LLM
+            with span(self.timings, "prompt"):
+                context = self._prepare_context(summary_data)
+
+            if self.api_token:
+                try:
+                    with span(self.timings, "inference"):
+                        raw_response = self._call_huggingface(context)
+                    with span(self.timings, "parse_response"):
+                        return self._parse_json_response(raw_response, summary_data)
+                except Exception as e:
+                    print(f"HF API Error: {e}")
+            with span(self.timings, "fallback"):
+                return self._generate_fallback_analysis(summary_data)
+        finally:
+            log_timings("ai_analysis", self.timings, mode="analyze", online=bool(self.api_token))
+
+    def stream_dataset_context(self, summary_data):
+        """
+        Streaming variant of analyze_dataset_context.
+        Yields (field, value) pairs as soon as each top-level field of the model's JSON closes.
+        Fields the model never delivers (no token, API error, malformed output) come from the fallback at the end.
+        """
+        self.timings.clear()
+        delivered = set()
         if self.api_token:
             try:
-                raw_response = self._call_huggingface(context)
-                return self._parse_json_response(raw_response, summary_data)
+                with span(self.timings, "prompt"):
+                    prompt = self._prepare_context(summary_data)
+                # Includes the consumer's time between fields, which is negligible for collect_dataset_context
+                with span(self.timings, "inference"):
+                    for key, value in self._stream_fields(prompt):
+                        delivered.add(key)
+                        yield key, value
             except Exception as e:
                 print(f"HF API Error: {e}")
-                return self._generate_fallback_analysis(summary_data)
-        else:
-            return self._generate_fallback_analysis(summary_data)
+
+        if not delivered.issuperset(CONTEXT_FIELDS):
+            with span(self.timings, "fallback"):
+                fallback = self._generate_fallback_analysis(summary_data)
+            for key, value in fallback.items():
+                if key not in delivered:
+                    yield key, value
+        log_timings("ai_analysis", self.timings, mode="stream", online=bool(self.api_token))
+
+    @profiled("ai_analysis")
+    def collect_dataset_context(self, summary_data, sink):
+        """
+        Background-worker entry point: drains stream_dataset_context into `sink`, a dict shared
+        with the UI thread, and returns the complete context.
+        """
+        for key, value in self.stream_dataset_context(summary_data):
+            sink[key] = value
+        return dict(sink)
+
+    async def generate_many(self, prompts):
+        """
+        Issues several prompts concurrently (e.g. per-deep-dive narratives) and returns the raw
+        completions in order; a failed prompt yields its exception instead of a string.
+        """
+        return await asyncio.gather(
+            *(asyncio.to_thread(self._call_huggingface, prompt) for prompt in prompts),
+            return_exceptions=True
+        )
 
     def _prepare_context(self, data):
         """
@@ -43,17 +109,24 @@ class AIEngine:
         num_str = ""
         for i, (col, stats) in enumerate(num_stats.items()):
             if i >= 5: break
-            num_str += f"- {col}: Mean={stats['mean']:.2f}, Max={stats['max']:.2f}\n"
+            num_str += f"- {col}: Mean={stats['mean']:.2f}, Median={stats['p50']:.2f}, P95={stats['p95']:.2f}, Max={stats['max']:.2f}\n"
 
         # 3. Categorical Stats
         cat_stats = data.get("categorical_stats", {})
         cat_str = ""
-        for i, (col, counter) in enumerate(cat_stats.items()):
+        for i, (col, stats) in enumerate(cat_stats.items()):
             if i >= 5: break
-            top_3 = ", ".join([f"{k}" for k,v in counter.most_common(3)])
-            cat_str += f"- {col}: {top_3}\n"
+            top_3 = ", ".join([f"{item['value']}" for item in stats["top"][:3]])
+            approx = "" if stats["distinct_exact"] else "~"
+            cat_str += f"- {col}: {top_3} ({approx}{stats['distinct']:,} distinct)\n"
+
+        # 4. Strongest Correlations
+        corr_str = ""
+        for pair in data.get("correlations", {}).get("top_pairs", [])[:3]:
+            if abs(pair["r"]) >= 0.3:
+                corr_str += f"- {pair['a']} vs {pair['b']}: r={pair['r']:.2f}\n"
 
-        # 4. Column Names for role classification
+        # 5. Column Names for role classification
         all_cols_list = list(num_stats.keys()) + list(cat_stats.keys())
         all_cols = ", ".join(all_cols_list)
 
@@ -71,6 +144,9 @@ KEY STATS:
 KEY CATEGORIES:
 {cat_str}
 
+STRONGEST CORRELATIONS:
+{corr_str or "- None notable"}
+
 TASK:
 Return a valid JSON object with the following structure:
 {{
@@ -93,9 +169,8 @@ Omit markdown formatting. Return raw JSON.
 """
         return prompt
 
-    def _call_huggingface(self, prompt):
-        headers = {"Authorization": f"Bearer {self.api_token}"}
-        payload = {
+    def _build_payload(self, prompt):
+        return {
             "inputs": prompt,
             "parameters": {
                 "max_new_tokens": 1000,
@@ -103,12 +178,64 @@ Omit markdown formatting. Return raw JSON.
                 "return_full_text": False
             }
         }
-        
-        response = requests.post(self.api_url, headers=headers, json=payload, timeout=25)
-        response.raise_for_status()
+
+    def _cache_key(self, payload):
+        # Same model + same payload => same completion; key on both so a model swap never hits old entries
+        return hashlib.sha256((self.api_url + "\n" + json.dumps(payload, sort_keys=True)).encode()).hexdigest()
+
+    def _call_huggingface(self, prompt):
+        payload = self._build_payload(prompt)
+        if self.response_cache is None:
+            return self._post_inference(payload)
+        # A completion that is not valid JSON is used once (via the fallback) but never cached,
+        # so the next request asks the model again instead of replaying it for the whole TTL
+        return self.response_cache.get_or_compute(
+            self._cache_key(payload), lambda: self._post_inference(payload), cacheable=_parses_as_json
+        )
+
+    def _stream_fields(self, prompt):
+        """
+        Streams tokens from the endpoint through an IncrementalJSONParser, yielding fields as they close.
+        Stops reading (and closes the connection) once the top-level object is complete.
+        Concurrent callers with the same prompt share one upstream stream: the first one streams,
+        the others wait for its completed text (see ResponseCache.claim).
+        """
+        payload = self._build_payload(prompt)
+        key = self._cache_key(payload)
+        parser = IncrementalJSONParser()
+
+        cached, flight = self.response_cache.claim(key) if self.response_cache is not None else (None, None)
+        if cached is not None:
+            yield from parser.feed(cached)
+            return
+
+        headers = {"Authorization": f"Bearer {self.api_token}"}
+        completed = None
+        try:
+            events = self.http_client.stream_events(self.api_url, {**payload, "stream": True}, headers=headers, budget=25)
+            try:
+                for event in events:
+                    token = event.get("token") or {}
+                    if token.get("special"):
+                        continue
+                    yield from parser.feed(token.get("text", ""))
+                    if parser.complete:
+                        break
+            finally:
+                events.close()
+            if parser.complete:
+                completed = parser.text
+        finally:
+            # Also on errors and early closes: waiting callers then stream for themselves
+            if flight is not None:
+                self.response_cache.release(key, flight, completed)
+
+    def _post_inference(self, payload):
+        headers = {"Authorization": f"Bearer {self.api_token}"}
+        # Retries 503 "model loading" within a 25s overall budget instead of failing on first response
+        result = self.http_client.post_json(self.api_url, payload, headers=headers, budget=25)
         
         # Parse output
-        result = response.json()
         if isinstance(result, list) and len(result) > 0:
             return result[0].get('generated_text', '').strip()
         else:
@@ -116,11 +243,7 @@ Omit markdown formatting. Return raw JSON.
 
     def _parse_json_response(self, text, summary_data):
         try:
-            if "```json" in text:
-                text = text.split("```json")[1].split("```")[0]
-            elif "{" in text:
-                text = text[text.find("{"):text.rfind("}")+1]
-            return json.loads(text)
+            return _load_json_response(text)
         except:
             return self._generate_fallback_analysis(summary_data)
 
@@ -128,8 +251,6 @@ Omit markdown formatting. Return raw JSON.
         """
         Deterministic expert fallback.
         """
-        time.sleep(1) 
-        
         # Heuristic Domain Detection
         cols = (list(data.get("numeric_stats", {}).keys()) + list(data.get("categorical_stats", {}).keys()))
         cols_str = " ".join(cols).lower()
@@ -165,3 +286,92 @@ Omit markdown formatting. Return raw JSON.
             ],
             "recommended_actions": ["Analyze Trends Over Time", "Compare Categories", "Inspect Distributions"]
         }
+
+class IncrementalJSONParser:
+    """
+    Parses one top-level JSON object that arrives in pieces (e.g. LLM tokens).
+    feed() returns the (key, value) members that closed within that piece; `complete` turns True
+    at the object's closing brace. Text before the first '{' (such as a ```json fence) is skipped,
+    and a member that fails to parse is dropped rather than aborting the stream.
+    """
+    def __init__(self):
+        self.text = "" # Object text seen so far, starting at its opening brace
+        self.complete = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, piece):
+        fields = []
+        if self.complete:
+            return fields
+        if not self.text:
+            brace = piece.find("{")
+            if brace == -1:
+                return fields
+            piece = piece[brace:]
+
+        start = len(self.text)
+        self.text += piece
+        for i in range(start, len(self.text)):
+            ch = self.text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = i + 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    fields += self._close_member(i)
+                    self.text = self.text[:i + 1]
+                    self.complete = True
+                    break
+            elif ch == "," and self._depth == 1:
+                fields += self._close_member(i)
+                self._member_start = i + 1
+        return fields
+
+    def _close_member(self, end):
+        member = self.text[self._member_start:end].strip()
+        if not member:
+            return []
+        try:
+            return list(json.loads("{" + member + "}").items())
+        except ValueError:
+            return []
+
+def _load_json_response(text):
+    """
+    Extracts the JSON object from a completion (inside a ```json fence or between the outer braces) and parses it.
+    """
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "{" in text:
+        text = text[text.find("{"):text.rfind("}")+1]
+    return json.loads(text)
+
+def _parses_as_json(text):
+    try:
+        _load_json_response(text)
+        return True
+    except ValueError:
+        return False
+
+def _read_secret(name):
+    """
+    Reads a Streamlit secret, returning None when no secrets file is configured.
+    """
+    try:
+        return st.secrets.get(name, None)
+    except Exception:
+        return None
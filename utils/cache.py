@@ -0,0 +1,311 @@
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def default_cache_dir():
+    """
+    Cache root of the user running the server, shared by every session: $XDG_CACHE_HOME/insightbridge
+    (~/.cache/insightbridge). Override with INSIGHTBRIDGE_CACHE_DIR.
+    """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("INSIGHTBRIDGE_CACHE_DIR", os.path.join(base, "insightbridge"))
+
+def _private_directory(directory):
+    """
+    Creates directory as 0o700 if needed. Cached values are unpickled, so anyone who can write
+    to the directory can run code as this user: refuse one owned by another user or writable by
+    group or others.
+    """
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"): # No POSIX owners or modes to check
+        return
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise PermissionError(
+            f"Refusing cache directory {directory}: it must be owned by the current user and "
+            f"not writable by group or others (chmod 700)"
+        )
+
+def stream_digest(file_obj, salt=""):
+    """
+    Hashes a file-like object block by block (BLAKE2b) without loading it whole, then rewinds it.
+    The salt lets callers fold a format version into the key.
+    """
+    digest = hashlib.blake2b(salt.encode(), digest_size=20)
+    file_obj.seek(0)
+    while True:
+        block = file_obj.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+def file_fingerprint(path):
+    """
+    Cheap identity of a local file: resolved path, size and modification time (ns). Rewriting the
+    file moves its mtime, so this tells changed files apart without reading a byte of them.
+    """
+    st = os.stat(path)
+    return (os.path.realpath(path), st.st_size, st.st_mtime_ns)
+
+def path_digest(path, salt=""):
+    """
+    Cache key of a local file from its file_fingerprint, in the format of stream_digest.
+    """
+    return hashlib.blake2b(f"{salt}:{file_fingerprint(path)!r}".encode(), digest_size=20).hexdigest()
+
+class DiskCache:
+    """
+    Size-bounded LRU cache of pickled values, one zlib-compressed file per key.
+    Safe to share between sessions and processes: writes are atomic renames and a hit
+    refreshes the file's mtime, which is the recency used for eviction.
+    The directory must be private to the current user (see _private_directory).
+    """
+    def __init__(self, directory, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        _private_directory(directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl.z")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.loads(zlib.decompress(f.read()))
+            os.utime(path)
+        except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Missing, half-evicted or written by an incompatible version: treat as a miss
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key, value):
+        payload = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 3)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pkl.z"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        # Oldest first; another process may already have removed some of them
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+class ResponseCache:
+    """
+    Two-tier (memory + disk) TTL cache for expensive calls such as LLM completions, with
+    single-flight coalescing: concurrent callers asking for the same key wait on one computation.
+    Memory holds up to `max_entries` in LRU order; the disk tier is a shared DiskCache.
+    """
+    def __init__(self, directory=None, ttl=24 * 3600, max_entries=256, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.disk = DiskCache(directory, max_bytes) if directory else None
+        self._memory = OrderedDict() # {key: (created_at, value)}
+        self._in_flight = {} # {key: Future}
+        self._lock = threading.Lock()
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "coalesced": 0, "errors": 0}
+
+    def get_or_compute(self, key, compute, cacheable=None):
+        """
+        Returns the cached value for key, or runs compute() once and caches its result.
+        Exceptions propagate to every waiting caller and are never cached; neither are results
+        for which cacheable(value) is false, though waiting callers still receive them.
+        """
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.counters["memory_hits"] += 1
+                return value
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = Future()
+                self._in_flight[key] = flight
+            else:
+                self.counters["coalesced"] += 1
+
+        if not leader:
+            return flight.result()
+
+        try:
+            entry = self._disk_get(key)
+            if entry is not None:
+                self._count("disk_hits")
+                created, value = entry
+            else:
+                self._count("misses")
+                value = compute()
+                created = time.time()
+                if cacheable is not None and not cacheable(value):
+                    flight.set_result(value)
+                    return value
+                if self.disk is not None:
+                    self.disk.put(key, (created, value))
+            with self._lock:
+                self._memory_put(key, value, created)
+            flight.set_result(value)
+            return value
+        except Exception as e:
+            self._count("errors")
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def get(self, key):
+        """
+        Looks a key up in memory, then on disk, without computing anything. Returns None on a miss.
+        """
+        with self._lock:
+            value = self._memory_get(key)
+            if value is not None:
+                self.counters["memory_hits"] += 1
+                return value
+        entry = self._disk_get(key)
+        if entry is None:
+            return None
+        self._count("disk_hits")
+        with self._lock:
+            self._memory_put(key, entry[1], entry[0])
+        return entry[1]
+
+    def claim(self, key):
+        """
+        Single-flight lookup for values produced outside get_or_compute, such as a streamed completion.
+        Returns (value, None) on a hit, including the value of a concurrent producer this call waited for.
+        Otherwise returns (None, flight): the caller now produces the value and must end with
+        release(key, flight, value), also on failure (value None), so that waiting callers wake up.
+        """
+        while True:
+            with self._lock:
+                value = self._memory_get(key)
+                if value is not None:
+                    self.counters["memory_hits"] += 1
+                    return value, None
+                flight = self._in_flight.get(key)
+                if flight is None:
+                    flight = Future()
+                    self._in_flight[key] = flight
+                    break
+                self.counters["coalesced"] += 1
+            value = flight.result()
+            if value is not None:
+                return value, None
+            # The producer gave up without a value; try again, possibly as the producer
+
+        entry = self._disk_get(key)
+        if entry is None:
+            return None, flight
+        self._count("disk_hits")
+        with self._lock:
+            self._memory_put(key, entry[1], entry[0])
+            self._in_flight.pop(key, None)
+        flight.set_result(entry[1])
+        return entry[1], None
+
+    def release(self, key, flight, value=None):
+        """
+        Ends a claim: caches value unless it is None and hands it to every caller waiting on the flight.
+        """
+        try:
+            if value is not None:
+                self.put(key, value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            flight.set_result(value)
+
+    def put(self, key, value):
+        """
+        Stores a value computed outside get_or_compute (e.g. a completed stream).
+        """
+        self._count("misses")
+        created = time.time()
+        if self.disk is not None:
+            self.disk.put(key, (created, value))
+        with self._lock:
+            self._memory_put(key, value, created)
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _memory_get(self, key):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self._memory[key]
+            return None
+        self._memory.move_to_end(key)
+        return entry[1]
+
+    def _memory_put(self, key, value, created):
+        # `created` is when the value was computed, so promoting a disk entry keeps its original expiry
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key):
+        """
+        Returns the unexpired (created_at, value) disk entry for key, or None.
+        """
+        if self.disk is None:
+            return None
+        entry = self.disk.get(key)
+        if entry is None or time.time() - entry[0] > self.ttl:
+            return None
+        return entry
+
+    def stats(self):
+        """
+        Counters plus the hit rate across both tiers; coalesced callers count as hits.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        served = stats["memory_hits"] + stats["disk_hits"] + stats["coalesced"]
+        stats["hit_rate"] = served / max(1, served + stats["misses"])
+        return stats
@@ -2,37 +2,46 @@ import plotly.express as px
 import pandas as pd
 import streamlit as st
 import numpy as np
+from utils.timing import timed
 
 # Premium Color Palette
 COLOR_PRIMARY = "#5e17eb" # Indigo
 COLOR_SECONDARY = "#00d2be" # Teal
 
-def create_trend_chart(summary_data, title="📈 Activity Trends"):
+@timed("chart.trend")
+def create_trend_chart(summary_data, metric="Records", granularity="day", agg="sum", title="📈 Activity Trends"):
     """
-    Creates a line chart showing trends over time using aggregated trend data.
+    Creates an area chart over time from the precomputed trend rollups.
+    `metric` is "Records" or a numeric column, aggregated per period by `agg`
+    (sum, mean, min or max); `granularity` is day, week, month or quarter.
     """
-    if not summary_data or not summary_data.get("trend_sorted"):
+    if not summary_data or not summary_data.get("trend_rollups"):
         return None
-        
-    trend_dict = summary_data["trend_sorted"]
-    
-    if len(trend_dict) < 2:
+
+    rollup = summary_data["trend_rollups"].get(granularity)
+    if not rollup or len(rollup["periods"]) < 2:
         return None
 
-    df = pd.DataFrame(list(trend_dict.items()), columns=['Date', 'Records'])
-    df['Date'] = pd.to_datetime(df['Date'])
-    df = df.sort_values('Date')
+    if metric == "Records":
+        values = rollup["records"]
+        label = "Records"
+    else:
+        values = rollup["metrics"][metric][agg]
+        label = f"{metric} ({agg})"
+
+    df = pd.DataFrame({'Date': pd.to_datetime(rollup["periods"]), label: values})
     
     # Intelligent Title
-    direction = _calculate_trend_direction(df['Records'])
-    full_title = f"{title} <span style='font-size: 14px; color: grey;'>({direction})</span>"
+    direction = _calculate_trend_direction(df[label].dropna())
+    full_title = f"{title}: {label} by {granularity} <span style='font-size: 14px; color: grey;'>({direction})</span>"
     
-    fig = px.area(df, x='Date', y='Records', title=full_title)
-    fig.update_traces(line_color=COLOR_PRIMARY, fill_color="rgba(94, 23, 235, 0.1)")
+    fig = px.area(df, x='Date', y=label, title=full_title)
+    fig.update_traces(line_color=COLOR_PRIMARY, fillcolor="rgba(94, 23, 235, 0.1)")
     
     _apply_premium_layout(fig)
     return fig
 
+@timed("chart.categorical")
 def create_categorical_chart(summary_data, title="📊 Top Categories"):
     """
     Creates a bar chart for the most prominent categorical column.
@@ -45,8 +54,8 @@ def create_categorical_chart(summary_data, title="📊 Top Categories"):
     max_count = 0
     cat_stats = summary_data["categorical_stats"]
     
-    for col, counter in cat_stats.items():
-        total_tracked = sum(counter.values())
+    for col, stats in cat_stats.items():
+        total_tracked = sum(item["count"] for item in stats["top"])
         if total_tracked > max_count:
             max_count = total_tracked
             best_col = col
@@ -55,11 +64,20 @@ def create_categorical_chart(summary_data, title="📊 Top Categories"):
         return None
         
     # Get top 10 items
-    top_items = cat_stats[best_col].most_common(10)
-    df = pd.DataFrame(top_items, columns=[best_col, 'Count'])
+    stats = cat_stats[best_col]
+    df = pd.DataFrame(stats["top"][:10]).rename(columns={"value": best_col, "count": "Count", "error": "Error"})
+    
+    # Cardinality in the title; error bars only when the sketch had to approximate
+    distinct = f"{stats['distinct']:,}" if stats["distinct_exact"] else f"~{stats['distinct']:,}"
+    full_title = f"{title}: {best_col} <span style='font-size: 14px; color: grey;'>({distinct} distinct values)</span>"
+    approximate = stats["error_bound"] > 0
+    df['No Error'] = 0 # Sketch counts are lower bounds, so the error bar only extends upwards
     
     # Horizontal bar for better readability
-    fig = px.bar(df, x='Count', y=best_col, title=f"{title}: {best_col}", orientation='h', text='Count')
+    fig = px.bar(
+        df, x='Count', y=best_col, title=full_title, orientation='h', text='Count',
+        error_x='Error' if approximate else None, error_x_minus='No Error' if approximate else None
+    )
     fig.update_traces(marker_color=COLOR_SECONDARY, textposition='outside')
     
     # Sort bars
@@ -68,6 +86,94 @@ def create_categorical_chart(summary_data, title="📊 Top Categories"):
     _apply_premium_layout(fig)
     return fig
 
+@timed("chart.segment")
+def create_segment_chart(summary_data, segment, metric="Records", agg="sum", top_n=15, title="📊 Segment Comparison"):
+    """
+    Creates a bar chart of one metric across the values of a segment column, read from the
+    group-by cube built at ingest. `metric` is "Records" or a numeric column; `agg` is sum or mean.
+    """
+    if not summary_data or segment not in summary_data.get("segment_stats", {}):
+        return None
+
+    stats = summary_data["segment_stats"][segment]
+    if metric == "Records":
+        values = stats["rows"]
+        label = "Records"
+    else:
+        values = stats["metrics"][metric][agg]
+        label = f"{metric} ({agg})"
+
+    df = pd.DataFrame({segment: [str(v) for v in stats["values"]], label: values})
+    df = df.nlargest(top_n, label)
+    others = len(stats["values"]) - len(df)
+    suffix = f" <span style='font-size: 14px; color: grey;'>(top {len(df)} of {len(stats['values'])})</span>" if others > 0 else ""
+
+    fig = px.bar(df, x=label, y=segment, title=f"{title}: {label} by {segment}{suffix}", orientation='h', text_auto='.3s')
+    fig.update_traces(marker_color=COLOR_SECONDARY, textposition='outside')
+    fig.update_layout(yaxis={'categoryorder': 'total ascending'})
+
+    _apply_premium_layout(fig)
+    return fig
+
+@timed("chart.histogram")
+def create_histogram_chart(summary_data, column, title="📐 Distribution"):
+    """
+    Creates a histogram of a numeric column from the streaming histogram built at ingest.
+    """
+    hist = (summary_data or {}).get("histograms", {}).get(column)
+    if not hist or not hist["counts"]:
+        return None
+
+    edges = np.asarray(hist["edges"])
+    df = pd.DataFrame({column: (edges[:-1] + edges[1:]) / 2, 'Records': hist["counts"]})
+
+    fig = px.bar(df, x=column, y='Records', title=f"{title}: {column}")
+    fig.update_traces(width=float(edges[1] - edges[0]), marker_color=COLOR_PRIMARY, marker_line_width=0)
+    fig.update_layout(bargap=0)
+
+    _apply_premium_layout(fig)
+    return fig
+
+@timed("chart.box")
+def create_box_chart(summary_data, column, by=None, title="📦 Spread"):
+    """
+    Creates a box plot of a numeric column, optionally split by a segment column,
+    from the reservoir sample collected at ingest.
+    """
+    sample = (summary_data or {}).get("reservoir_sample")
+    if sample is None or column not in sample.columns or sample[column].dropna().empty:
+        return None
+
+    by = by if by in sample.columns else None
+    label = f"{title}: {column}" + (f" by {by}" if by else "")
+    fig = px.box(
+        sample, x=by, y=column, title=f"{label} <span style='font-size: 14px; color: grey;'>({len(sample):,} sampled rows)</span>",
+        points=False
+    )
+    fig.update_traces(marker_color=COLOR_SECONDARY)
+
+    _apply_premium_layout(fig)
+    return fig
+
+@timed("chart.correlation")
+def create_correlation_heatmap(summary_data, title="🔗 Correlation Matrix"):
+    """
+    Creates a heatmap of the Pearson correlation matrix accumulated at ingest.
+    """
+    corr = (summary_data or {}).get("correlations")
+    if not corr or len(corr["columns"]) < 2:
+        return None
+
+    df = pd.DataFrame(corr["matrix"], index=corr["columns"], columns=corr["columns"])
+    fig = px.imshow(
+        df, title=title, zmin=-1, zmax=1, text_auto=".2f", aspect="auto",
+        color_continuous_scale=[[0, COLOR_SECONDARY], [0.5, "#ffffff"], [1, COLOR_PRIMARY]]
+    )
+
+    _apply_premium_layout(fig)
+    fig.update_layout(hovermode="closest")
+    return fig
+
 def _calculate_trend_direction(series):
     """
     Simple heuristic to determine trend direction.
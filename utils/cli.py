@@ -0,0 +1,260 @@
+"""
+Headless batch profiler: runs the same profiling core as the app, without Streamlit.
+
+Profiles one file, a glob or a directory of data files (CSV, gzip/bz2/zstd CSV, Parquet, Arrow)
+and writes one summary per input plus a throughput report (report.json) to the output directory:
+
+    python -m utils.cli data/sales.csv --out profiles/
+    python -m utils.cli "exports/*.csv" data/ --jobs 4 --format pickle
+
+Several inputs are profiled in parallel, one file per process. A single input is split
+across cores instead (see profile_file's `workers`). Exits non-zero if any file failed.
+
+With --state, the inputs are instead appended, in order, to a saved profile state (created on
+first use) and one summary of all the data merged so far is written; each run only reads the
+new files, and inputs already merged into the state are skipped:
+
+    python -m utils.cli exports/2024-06-01.csv --state profiles/sales.state
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import pickle
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import DiskCache, file_fingerprint
+from utils.data_loader import INPUT_EXTENSIONS, load_state, profile_file, profile_state, save_state, summarize_state
+
+SUMMARY_SUFFIX = {"json": ".summary.json", "pickle": ".summary.pkl.z"}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="Data files, glob patterns or directories (searched recursively)")
+    parser.add_argument("--out", default="profiles", help="Directory for summaries and report.json")
+    parser.add_argument("--format", choices=sorted(SUMMARY_SUFFIX), default="json",
+                        help="json (readable; drops the row sample) or pickle (zlib-compressed, complete)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Files profiled at once")
+    parser.add_argument("--workers", type=int, default=None, help="Processes per file (default: auto for a single input, 1 otherwise)")
+    parser.add_argument("--backend", choices=["auto", "arrow", "pandas"], default="auto")
+    parser.add_argument("--cache-dir", default=None, help="Reuse summaries of unchanged files from this DiskCache directory")
+    parser.add_argument("--state", default=None, help="Profile state file to append the inputs to (see above)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final report")
+    args = parser.parse_args(argv)
+
+    paths = expand_inputs(args.inputs)
+    if not paths:
+        parser.error("no data files matched the given inputs")
+    os.makedirs(args.out, exist_ok=True)
+    outputs = _output_paths(paths, args.out, args.format)
+
+    log = _ignore if args.quiet else _log
+    started = time.perf_counter()
+    results = []
+    if args.state:
+        progress = None if args.quiet else _print_progress
+        results = update_state(paths, args.state, args.out, args.format, args.backend, args.workers, progress)
+        for entry in results:
+            log(_describe(entry))
+    elif len(paths) == 1:
+        # One file: let profile_file spread it across cores and report its progress
+        progress = None if args.quiet else _print_progress
+        results.append(profile_path(paths[0], outputs[0], args.format, args.backend, args.workers, args.cache_dir, progress))
+        log(_describe(results[0]))
+    else:
+        workers = args.workers or 1
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = [
+                pool.submit(profile_path, path, output, args.format, args.backend, workers, args.cache_dir)
+                for path, output in zip(paths, outputs)
+            ]
+            for future in as_completed(futures):
+                results.append(future.result())
+                log(_describe(results[-1]))
+
+    report = build_report(results, time.perf_counter() - started)
+    with open(os.path.join(args.out, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(_format_report(report))
+    return 1 if report["failed"] else 0
+
+def expand_inputs(inputs):
+    """
+    Resolves files, glob patterns and directories (recursively, INPUT_EXTENSIONS) into a sorted,
+    de-duplicated path list.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            found = glob.glob(os.path.join(item, "**", "*"), recursive=True)
+            paths += [p for p in found if p.lower().endswith(INPUT_EXTENSIONS) and os.path.isfile(p)]
+        elif glob.has_magic(item):
+            paths += [p for p in glob.glob(item, recursive=True) if os.path.isfile(p)]
+        elif os.path.isfile(item):
+            paths.append(item)
+    return sorted({os.path.abspath(p) for p in paths})
+
+def _output_paths(paths, out_dir, fmt):
+    # Same file name from different directories gets a numeric suffix
+    seen = {}
+    outputs = []
+    for path in paths:
+        base = os.path.basename(path)
+        stem = next((base[:-len(ext)] for ext in INPUT_EXTENSIONS if base.lower().endswith(ext)), os.path.splitext(base)[0])
+        seen[stem] = seen.get(stem, 0) + 1
+        name = stem if seen[stem] == 1 else f"{stem}-{seen[stem]}"
+        outputs.append(os.path.join(out_dir, name + SUMMARY_SUFFIX[fmt]))
+    return outputs
+
+def profile_path(path, output, fmt, backend="auto", workers=1, cache_dir=None, progress=None):
+    """
+    Process-pool entry point: profiles one file and writes its summary.
+    Returns a report entry; failures are recorded instead of raised so one bad file never stops the batch.
+    """
+    entry = {"path": path, "output": output}
+    try:
+        cache = DiskCache(cache_dir) if cache_dir else None
+        with open(path, "rb") as f:
+            summary = profile_file(f, workers=workers, cache=cache, backend=backend, progress=progress)
+        write_summary(summary, output, fmt)
+        entry["ingest"] = summary["ingest"]
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+    return entry
+
+def update_state(paths, state_path, out_dir, fmt, backend="auto", workers=None, progress=None):
+    """
+    Appends each file, in order, to the profile state at state_path (a new profile when the file
+    does not exist yet), saves the state back and writes the summary of everything merged so far.
+    A file that fails is recorded and left out; the others are still merged. A file the state
+    already holds (same path, size and mtime; see utils.cache.file_fingerprint) is skipped, so re-running the same
+    command never counts its rows twice; a file that changed since is appended again as new data.
+    """
+    state = load_state(state_path) if os.path.exists(state_path) else None
+    output = os.path.join(out_dir, os.path.basename(state_path).split(".")[0] + SUMMARY_SUFFIX[fmt])
+    merged = {tuple(source["fingerprint"]) for source in state["sources"] if "fingerprint" in source} if state else set()
+    appended = False
+    results = []
+    for path in paths:
+        entry = {"path": path, "output": output}
+        try:
+            fingerprint = file_fingerprint(path)
+            if fingerprint in merged:
+                entry["skipped"] = "already in the state"
+                results.append(entry)
+                continue
+            with open(path, "rb") as f:
+                state = profile_state(f, workers=workers, backend=backend, progress=progress, state=state)
+            state["sources"][-1]["fingerprint"] = fingerprint
+            merged.add(fingerprint)
+            appended = True
+            entry["ingest"] = state["sources"][-1]
+        except Exception as e:
+            entry["error"] = f"{type(e).__name__}: {e}"
+        results.append(entry)
+    if appended:
+        save_state(state, state_path)
+    if state is not None:
+        write_summary(summarize_state(state), output, fmt)
+    return results
+
+def write_summary(summary, output, fmt):
+    """
+    Writes a summary as JSON or as a zlib-compressed pickle (the DiskCache encoding), atomically.
+    """
+    tmp_path = output + ".tmp"
+    if fmt == "json":
+        with open(tmp_path, "w") as f:
+            json.dump(to_jsonable({k: v for k, v in summary.items() if k != "reservoir_sample"}), f)
+    else:
+        with open(tmp_path, "wb") as f:
+            f.write(zlib.compress(pickle.dumps(summary, protocol=pickle.HIGHEST_PROTOCOL), 3))
+    os.replace(tmp_path, output)
+
+def to_jsonable(value):
+    """
+    Converts a summary into strict JSON types: DataFrames become row records, numpy scalars
+    become Python numbers, timestamps become ISO strings, and NaN/infinity become null.
+    """
+    if isinstance(value, dict):
+        return {str(k): to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    if isinstance(value, pd.DataFrame):
+        return to_jsonable(value.to_dict(orient="records"))
+    if isinstance(value, (np.ndarray, pd.Series)):
+        return to_jsonable(value.tolist())
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return pd.Timestamp(value).isoformat() if not pd.isna(value) else None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if value is pd.NA or value is pd.NaT:
+        return None
+    return value
+
+def build_report(results, wall_seconds):
+    """
+    Aggregate throughput across the batch: wall-clock rates plus per-file ingest stats.
+    """
+    done = [r for r in results if "ingest" in r]
+    skipped = sum(1 for r in results if "skipped" in r)
+    total_bytes = sum(r["ingest"]["bytes"] for r in done)
+    total_rows = sum(r["ingest"]["rows"] for r in done)
+    wall_seconds = max(wall_seconds, 1e-9)
+    return {
+        "files": len(results),
+        "succeeded": len(done),
+        "skipped": skipped,
+        "failed": len(results) - len(done) - skipped,
+        "cache_hits": sum(1 for r in done if r["ingest"]["cache_hit"]),
+        "bytes": total_bytes,
+        "rows": total_rows,
+        "wall_seconds": wall_seconds,
+        "mb_per_s": total_bytes / wall_seconds / 1e6,
+        "rows_per_s": total_rows / wall_seconds,
+        "results": sorted(results, key=lambda r: r["path"])
+    }
+
+def _format_report(report):
+    lines = [
+        f"{report['succeeded']}/{report['files']} files profiled"
+        + (f" ({report['cache_hits']} from cache)" if report["cache_hits"] else "")
+        + (f", {report['skipped']} skipped (already in the state)" if report["skipped"] else "")
+        + f" · {report['rows']:,} rows · {report['bytes'] / 1e6:,.1f} MB in {report['wall_seconds']:.1f}s"
+        + f" · {report['mb_per_s']:.1f} MB/s · {report['rows_per_s']:,.0f} rows/s"
+    ]
+    lines += [f"FAILED {r['path']}: {r['error']}" for r in report["results"] if "error" in r]
+    return "\n".join(lines)
+
+def _describe(entry):
+    if "error" in entry:
+        return f"✗ {entry['path']}: {entry['error']}"
+    if "skipped" in entry:
+        return f"- {entry['path']}: skipped, {entry['skipped']}"
+    ingest = entry["ingest"]
+    source = "cache" if ingest["cache_hit"] else f"{ingest['mb_per_s']:.1f} MB/s, {ingest['backend']}"
+    return f"✓ {entry['path']} → {entry['output']} ({ingest['rows']:,} rows, {source})"
+
+def _print_progress(fraction, text):
+    sys.stderr.write(f"\r{fraction:6.1%} {text}\033[K")
+    if fraction >= 1.0:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+def _ignore(message):
+    pass
+
+if __name__ == "__main__":
+    sys.exit(main())
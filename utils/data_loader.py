@@ -1,211 +1,1631 @@
 import pandas as pd
-import streamlit as st
 import numpy as np
-from collections import Counter
+import bz2
+import copy
+import gzip
 import io
-import random
-from datetime import datetime, timedelta
-
-def generate_synthetic_csv():
-    """
-    Generates a realistic retail sales dataset as an in-memory CSV buffer.
-    """
-    rows = 5000
-    
-    # 1. Date Range (Last 6 months)
-    end_date = datetime.now()
-    dates = [(end_date - timedelta(days=x)).strftime('%Y-%m-%d') for x in range(180)]
-    col_dates = [random.choice(dates) for _ in range(rows)]
-    
-    # 2. Categories
-    categories = ['Electronics', 'Home & Garden', 'Fashion', 'Sports', 'Beauty']
-    col_cats = [random.choice(categories) for _ in range(rows)]
-    
-    # 3. Regions
-    regions = ['North America', 'Europe', 'Asia Pacific', 'Latin America']
-    col_regions = [random.choice(regions) for _ in range(rows)]
-    
-    # 4. Metrics (Sales, Profit)
-    col_sales = [round(random.uniform(50.0, 1500.0), 2) for _ in range(rows)]
-    col_profit = [round(s * random.uniform(0.1, 0.4), 2) for s in col_sales]
-    
-    # Create DataFrame
-    df = pd.DataFrame({
-        'Date': col_dates,
-        'Category': col_cats,
-        'Region': col_regions,
-        'Sales Amount': col_sales,
-        'Profit': col_profit
-    })
-    
-    # Intentionally add some missing values to test quality checks
-    mask = np.random.choice([True, False], size=rows, p=[0.02, 0.98])
-    df.loc[mask, 'Region'] = np.nan
-    
-    # Return as BytesIO
-    buffer = io.BytesIO()
-    df.to_csv(buffer, index=False)
+import mmap
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pandas.tseries.api import guess_datetime_format
+from utils.sketches import CategoricalSketch, QuantileSketch, ReservoirSample, StreamingHistogram
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError: # Optional: the pandas parser is used instead; Parquet/Arrow input is unavailable
+    pa = None
+try:
+    import zstandard
+except ImportError: # Optional: pyarrow's zstd codec is used instead
+    zstandard = None
+from utils.cache import path_digest, stream_digest
+from utils.timing import log_timings, merge_timings, profiled, span, timed_iter
+
+def generate_synthetic_csv(seed=42, rows=5000, out=None, days=180, categories=5, regions=4,
+                           extra_columns=0, missing_rate=0.02, end_date=None):
+    """
+    Generates a realistic retail sales dataset as CSV: daily volume with an upward trend plus
+    weekly and yearly seasonality, Zipf-skewed category and region frequencies, category-dependent
+    lognormal sales, and `missing_rate` blanks in Region and in the extra columns.
+    Seeded, so the same day's sample is byte-identical and hits the profile cache.
+
+    Rows are generated and written SYNTHETIC_CHUNK_ROWS at a time, so memory stays flat however
+    large `rows` is. `out` is a path or a writable binary stream; without it the CSV is returned
+    as an in-memory buffer (the app's sample data). `extra_columns` widens the table with numeric
+    metrics (correlated with sales) and, every third column, attributes with `categories` levels.
+    """
+    rng = np.random.default_rng(seed)
+    end_date = pd.Timestamp(end_date or datetime.now()).normalize()
+
+    # 1. Date Range (Last `days` days): volume grows over the period, peaks at weekends and in December
+    calendar = pd.date_range(end=end_date, periods=days)
+    t = np.linspace(0, 1, days)
+    seasonality = (1 + 0.25 * (calendar.dayofweek.to_numpy() >= 5)) * (1 + 0.2 * np.cos(2 * np.pi * (calendar.dayofyear.to_numpy() - 350) / 365))
+    day_weights = (1 + 0.6 * t) * seasonality
+    day_weights /= day_weights.sum()
+    day_labels = pd.Index(calendar.strftime('%Y-%m-%d'))
+
+    # 2. Categories and Regions, with skewed frequencies and per-category price levels
+    category_labels = pd.Index(_synthetic_labels(SYNTHETIC_CATEGORIES, categories, "Category"))
+    region_labels = pd.Index(_synthetic_labels(SYNTHETIC_REGIONS, regions, "Region"))
+    category_weights = _zipf_weights(categories, 1.1)
+    region_weights = _zipf_weights(regions, 0.8)
+    price_level = rng.uniform(4.0, 6.0, categories) # log-scale mean sale per category
+    margin_level = rng.uniform(0.1, 0.3, categories)
+
+    buffer = None
+    if out is None:
+        buffer = out = io.BytesIO()
+    sink = open(out, "wb") if isinstance(out, (str, os.PathLike)) else out
+    try:
+        for offset in range(0, max(rows, 1), SYNTHETIC_CHUNK_ROWS):
+            n = min(SYNTHETIC_CHUNK_ROWS, rows - offset)
+            day = rng.choice(days, n, p=day_weights)
+            category = rng.choice(categories, n, p=category_weights)
+            region = rng.choice(regions, n, p=region_weights)
+            region[rng.random(n) < missing_rate] = -1 # Intentionally missing, to exercise quality checks
+
+            # 3. Metrics (Sales, Profit): seasonal demand lifts basket size too
+            sales = np.exp(price_level[category] + 0.6 * rng.standard_normal(n)) * seasonality[day]
+            sales = sales.round(2)
+            profit = (sales * (margin_level[category] + rng.uniform(0, 0.1, n))).round(2)
+
+            columns = {
+                'Date': pd.Categorical.from_codes(day, day_labels),
+                'Category': pd.Categorical.from_codes(category, category_labels),
+                'Region': pd.Categorical.from_codes(region, region_labels),
+                'Sales Amount': sales,
+                'Profit': profit
+            }
+            for j in range(extra_columns):
+                missing = rng.random(n) < missing_rate
+                if j % 3 == 2:
+                    codes = rng.choice(categories, n, p=category_weights)
+                    codes[missing] = -1
+                    columns[f'Attribute {j + 1}'] = pd.Categorical.from_codes(codes, category_labels)
+                else:
+                    metric = (np.log(sales) + rng.standard_normal(n)).round(3)
+                    metric[missing] = np.nan
+                    columns[f'Metric {j + 1}'] = metric
+            # Built in one go: inserting wide columns one by one fragments the frame
+            _write_csv_chunk(pd.DataFrame(columns), sink, header=offset == 0)
+    finally:
+        if sink is not out:
+            sink.close()
+
+    if buffer is None:
+        return out
     buffer.seek(0)
     buffer.name = "sample_retail_data.csv" # Mock filename
     return buffer
 
-def process_uploaded_file(uploaded_file):
+def _synthetic_labels(names, n, prefix):
+    return list(names[:n]) + [f"{prefix} {i + 1}" for i in range(len(names), n)]
+
+def _zipf_weights(n, exponent):
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+def _write_csv_chunk(df, sink, header):
+    """
+    Appends a DataFrame to a binary CSV stream: Arrow's multithreaded writer when pyarrow is
+    installed (several times faster than to_csv), pandas otherwise.
+    """
+    if pa is not None:
+        options = pa_csv.WriteOptions(include_header=header, quoting_style="needed")
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), sink, write_options=options)
+    else:
+        sink.write(df.to_csv(index=False, header=header).encode())
+
+PROFILER_VERSION = 16 # Bump whenever the summary format changes; part of every cache key
+CHUNK_SIZE = 100_000
+TREND_GRANULARITIES = ("day", "week", "month", "quarter")
+TREND_FILL = {"records": 0, "count": 0, "sum": 0.0, "min": np.inf, "max": -np.inf} # Empty value of each per-day trend array
+QUANTILES = {"p1": 0.01, "p25": 0.25, "p50": 0.50, "p75": 0.75, "p95": 0.95, "p99": 0.99}
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024 # Below this, process startup costs more than it saves
+RANGES_PER_WORKER = 4 # Finer ranges balance load and give smoother progress
+SPILL_BLOCK_BYTES = 8 * 1024 * 1024 # Copy size when an upload is spilled to disk for parallel workers
+ARROW_BLOCK_SIZE = 1024 * 1024 # Arrow reads ahead several blocks, so this bounds its peak memory
+SCHEMA_SAMPLE_ROWS = 20_000 # Rows read from the head of the file to decide column dtypes
+SCHEMA_WINDOWS = 4 # Extra samples taken at evenly spaced offsets, so late surprises are seen too
+SCHEMA_WINDOW_BYTES = 256 * 1024
+NUMERIC_TOLERANCE = 0.01 # Share of non-numeric tokens a column may carry and still count as numeric
+DATE_PROBE_VALUES = 200 # Sampled dates each candidate format is tried on before the winner parses the whole sample
+CATEGORY_MAX_DISTINCT = 1000 # Strings with at most this many distinct values are parsed as category
+SEGMENT_MAX_GROUPS = 1000 # A segment column with more values than this is dropped from the group-by cube
+RESERVOIR_ROWS = 50_000 # Uniform row sample kept for distribution charts
+SYNTHETIC_CATEGORIES = ('Electronics', 'Home & Garden', 'Fashion', 'Sports', 'Beauty')
+SYNTHETIC_REGIONS = ('North America', 'Europe', 'Asia Pacific', 'Latin America')
+SYNTHETIC_CHUNK_ROWS = 500_000 # Rows generated and written per step; bounds the generator's memory
+MAPPED_RELEASE_BYTES = 64 * 1024 * 1024 # Consumed pages of a memory-mapped file are dropped from RSS in steps of this size
+INPUT_EXTENSIONS = (".csv", ".csv.gz", ".csv.bz2", ".csv.zst", ".parquet", ".arrow", ".feather") # Uploads, drop folder, CLI
+COMPRESSED_SIGNATURES = {b"\x1f\x8b": "gzip", b"BZh": "bz2", b"\x28\xb5\x2f\xfd": "zstd"} # Leading magic bytes
+COLUMNAR_FORMATS = ("parquet", "arrow") # Read batch by batch through Arrow instead of the CSV parsers
+PROVISIONAL_FIRST_CHUNKS = 3 # The first provisional summary is published after this many chunks...
+PROVISIONAL_FIRST_SECONDS = 2.0 # ...or this long into the ingest, whichever comes first
+PROVISIONAL_INTERVAL = 5.0 # Seconds between later provisional summaries
+PROVISIONAL_OVERHEAD = 0.02 # Share of ingest time provisional summaries may take; slow ones stretch the interval
+
+def process_uploaded_file(uploaded_file, workers=None, cache=None, backend="auto", state=None, provisional=None):
+    """
+    Streamlit front end of profile_state: shows a progress bar while profiling and reports
+    failures with st.error. Returns the profile state (finalize it with summarize_state), or
+    None if the file could not be read. Pass `state` to append the file to an earlier profile,
+    and `provisional` to render early results while a large file is read.
+    """
+    # Imported here so the profiling core runs without a Streamlit runtime (see utils/cli.py)
+    import streamlit as st
+
+    progress_bar = st.progress(0, text="Processing data chunks...")
+    try:
+        return profile_state(
+            uploaded_file, workers=workers, cache=cache, backend=backend, state=state, provisional=provisional,
+            progress=lambda fraction, text: progress_bar.progress(fraction, text=text)
+        )
+    except Exception as e:
+        st.error(f"Error processing file: {e}")
+        return None
+    finally:
+        progress_bar.empty()
+
+@profiled("profile_file")
+def profile_file(file_obj, workers=None, cache=None, backend="auto", progress=None, provisional=None):
     """
     Reads a CSV file in chunks and computes aggregated statistics and visualization data.
-    Returns a dictionary containing the analysis results.
+    Returns a dictionary containing the analysis results; parse errors propagate to the caller.
+
+    `workers` selects the execution mode: 1 profiles sequentially, N > 1 splits the file into
+    line-aligned byte ranges profiled on a pool of N processes, and None picks N = the usable
+    cores for files of PARALLEL_MIN_BYTES or more, else 1 (one core gains nothing from a pool).
+
+    `cache` is an optional utils.cache.DiskCache; data profiled before by the same PROFILER_VERSION
+    is served from it without parsing the file. A local file is recognized by its path, size and
+    mtime, any other stream by a hash of its bytes.
+
+    `backend` picks the CSV parser: "arrow" (multithreaded, requires pyarrow), "pandas",
+    or "auto" (Arrow when installed). Column dtypes are decided once from a sample of the file
+    and pinned for every chunk; if a value outside the sample breaks them, the file is re-read
+    with per-chunk inference and summary["ingest"]["backend"] reads "pandas-loose".
+
+    `progress` is an optional callback progress(fraction, text), called as bytes are consumed.
+
+    `provisional` is an optional callback provisional(summary) for early results on long ingests:
+    it receives summaries of the rows read so far, the first after PROVISIONAL_FIRST_CHUNKS chunks
+    or PROVISIONAL_FIRST_SECONDS, then every PROVISIONAL_INTERVAL seconds (stretched so they take
+    at most PROVISIONAL_OVERHEAD of the ingest time). Those carry summary["provisional"] =
+    {snapshot, fraction of the file read, seconds}; the returned summary does not.
+
+    Besides plain CSV, the file may be gzip/bz2/zstd-compressed CSV (decompressed while streaming,
+    in one process) or a Parquet / Arrow IPC (Feather v2) file, read batch by batch with only the
+    profiled columns (requires pyarrow). The format is detected from the file's magic bytes and
+    reported in summary["ingest"]["format"].
+
+    A file object opened from the local filesystem (open(path, "rb")) is memory-mapped rather
+    than read: chunks are parsed straight from the mapping and parallel workers map their own
+    byte ranges, so peak memory tracks chunk size x workers instead of file size.
+
+    summary["ingest"]["stages"] holds the seconds spent per stage (see utils/timing.py); chunk
+    stages are summed across workers, so in parallel mode they can exceed the wall time.
+
+    This is profile_state followed by summarize_state; keep the state instead to append more
+    data to the profile later.
     """
-    CHUNK_SIZE = 100_000
-    
-    # Initialize accumulators
-    summary = {
+    return summarize_state(profile_state(
+        file_obj, workers=workers, cache=cache, backend=backend, progress=progress, provisional=provisional
+    ))
+
+@profiled("profile_state")
+def profile_state(file_obj, workers=None, cache=None, backend="auto", progress=None, state=None, provisional=None):
+    """
+    Profiles a file into a profile state: the schema and mergeable accumulators behind a summary,
+    before finalization. Arguments are those of profile_file; the cache stores states.
+
+    With `state`, the file is appended to that profile instead. It is parsed with the state's
+    schema (its columns must match) and only its own accumulators are built, then merged into a
+    copy of the state's, so an append costs time proportional to the new data. The given state
+    is left unchanged. Appends are not cached; their provisional summaries cover the state's
+    data plus the new rows read so far.
+
+    A state is a plain dict: {"version": PROFILER_VERSION, "revision": appends so far,
+    "schema", "partial", "sources": [ingest stats of every file merged in, oldest first]}.
+    """
+    progress = progress or _ignore_progress
+    stages = {}
+    cache_key = None
+    if state is not None:
+        if state["version"] != PROFILER_VERSION:
+            raise ValueError(f"Profile state has version {state['version']}, expected {PROFILER_VERSION}; profile the data again")
+        cache = None
+    if cache is not None:
+        with span(stages, "cache"):
+            # A local file is keyed by path, size and mtime; only uploads are hashed byte by byte
+            path = _local_path(file_obj)
+            salt = f"profile-v{PROFILER_VERSION}"
+            cache_key = path_digest(path, salt) if path else stream_digest(file_obj, salt)
+            cached = cache.get(cache_key)
+        if cached is not None:
+            cached["sources"][-1]["cache_hit"] = True
+            log_timings("profile", stages, cache_hit=True)
+            return cached
+
+    # Check total size for progress reporting
+    file_obj.seek(0, 2)
+    total_size = file_obj.tell()
+    file_obj.seek(0)
+
+    input_format = _detect_format(file_obj)
+    if input_format != "csv":
+        # A compressed stream cannot be split at byte offsets; columnar files decode on Arrow's threads
+        workers = 1
+    elif workers is None:
+        cores = _usable_cores()
+        workers = cores if cores > 1 and total_size >= PARALLEL_MIN_BYTES else 1
+    if backend == "auto" or (backend == "arrow" and pa is None):
+        backend = "arrow" if pa is not None else "pandas"
+
+    schema = None
+    seed = 0
+    if state is not None:
+        with span(stages, "schema"):
+            schema = _append_schema(state, file_obj, input_format)
+        # Reservoir keys of every revision must be independent of the earlier ones
+        seed = (state["revision"] + 1) << 20
+
+    progress(0.0, "Processing data chunks...")
+    started = time.perf_counter()
+    snapshots = _Provisional(provisional, state["partial"] if state is not None else None) if provisional else None
+    if input_format in COLUMNAR_FORMATS:
+        # Typed input: the file itself carries the schema
+        schema, partial = _profile_columnar(file_obj, input_format, total_size, progress, schema, seed, snapshots)
+        backend = input_format
+    else:
+        if schema is None:
+            # Every chunk (and every worker) is parsed with the dtypes decided here
+            with span(stages, "schema"):
+                schema = _infer_schema(file_obj, total_size, compression=None if input_format == "csv" else input_format)
+        partial = None
+        if workers > 1:
+            attempt = time.perf_counter()
+            try:
+                partial, backend = _profile_parallel(file_obj, schema, workers, progress, backend, seed, snapshots)
+            except (ValueError, TypeError):
+                # A range the parser rejects even leniently, e.g. cut by an unbalanced quote inside an
+                # unquoted field; one stream parses whatever a single pandas read would
+                stages["retries"] = stages.get("retries", 0.0) + time.perf_counter() - attempt
+                workers = 1
+                file_obj.seek(0)
+        if partial is None:
+            partial, backend = _profile_sequential(file_obj, schema, total_size, progress, backend, seed, snapshots)
+
+    progress(1.0, "Finalizing analysis...")
+    merge_timings(stages, partial["timings"])
+    if snapshots and snapshots.seconds:
+        stages["provisional"] = snapshots.seconds
+    ingest = _ingest_stats(partial["rows"], total_size, time.perf_counter() - started, workers, backend)
+    ingest["format"] = input_format
+    ingest["name"] = getattr(file_obj, "name", None)
+    ingest["stages"] = stages # {stage: seconds}
+    if state is None:
+        state = {"version": PROFILER_VERSION, "revision": 0, "schema": schema, "partial": partial, "sources": []}
+    else:
+        # The delta was parsed with the state's schema, so the two reduce like two byte ranges of one file
+        with span(stages, "merge"):
+            merged = _merge_partials(copy.deepcopy(state["partial"]), partial)
+        state = dict(state, revision=state["revision"] + 1, partial=merged, sources=list(state["sources"]))
+    state["sources"].append(ingest)
+    log_timings("profile", stages, revision=state["revision"], **{k: ingest[k] for k in ("rows", "bytes", "seconds", "workers", "backend", "format")})
+    if cache is not None:
+        cache.put(cache_key, state)
+    return state
+
+def summarize_state(state):
+    """
+    Finalizes a profile state into the summary dictionary the app consumes. The cost depends on
+    the size of the accumulators, not on the rows behind them, so callers can finalize lazily
+    when a summary is read. summary["ingest"] describes the latest file merged in and
+    summary["sources"] every file, oldest first.
+    """
+    started = time.perf_counter()
+    summary = _finalize_summary(state["schema"], state["partial"])
+    summary["ingest"] = dict(state["sources"][-1])
+    summary["ingest"]["stages"] = dict(summary["ingest"]["stages"], finalize=time.perf_counter() - started)
+    summary["revision"] = state["revision"]
+    summary["sources"] = [
+        {k: source[k] for k in ("name", "format", "rows", "bytes", "cache_hit")} for source in state["sources"]
+    ]
+    return summary
+
+def save_state(state, path):
+    """
+    Writes a profile state as a zlib-compressed pickle (the DiskCache encoding), atomically.
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 3))
+    os.replace(tmp_path, path)
+
+def load_state(path):
+    """
+    Reads a profile state written by save_state. Raises ValueError for a state written by
+    another PROFILER_VERSION, whose accumulators cannot be merged with this version's.
+    """
+    with open(path, "rb") as f:
+        state = pickle.loads(zlib.decompress(f.read()))
+    if state.get("version") != PROFILER_VERSION:
+        raise ValueError(f"{path} holds a version {state.get('version')} profile state, expected {PROFILER_VERSION}")
+    return state
+
+def _append_schema(state, file_obj, input_format):
+    """
+    The state's schema, adjusted for parsing an appended file: the file's columns are checked
+    against the profile's, and every histogram starts on the state's current bins so the two
+    merge without re-binning. Rewinds the file.
+    """
+    schema = dict(state["schema"])
+    if input_format in COLUMNAR_FORMATS:
+        reader = _open_columnar(file_obj, input_format)
+        columns = (reader.schema_arrow if input_format == "parquet" else reader.schema).names
+        schema["compression"] = None
+    else:
+        schema["compression"] = None if input_format == "csv" else input_format
+        file_obj.seek(0)
+        columns = pd.read_csv(_decompress(file_obj, schema["compression"]) if schema["compression"] else file_obj, nrows=0).columns
+        schema["header"] = list(columns) # Columns may come in another order than in the profiled file
+        if schema["dtypes"].get(schema["date_col"]) == "datetime":
+            # Profiled from typed (columnar) input; in CSV the dates arrive as text
+            schema["dtypes"] = dict(schema["dtypes"], **{schema["date_col"]: "str"})
+    file_obj.seek(0)
+
+    missing = [c for c in schema["column_info"] if c not in set(columns)]
+    extra = [c for c in columns if c not in schema["column_info"]]
+    if missing or extra:
+        raise ValueError(
+            "Appended data must have the same columns as the profile"
+            + (f"; missing: {', '.join(missing)}" if missing else "")
+            + (f"; unexpected: {', '.join(map(str, extra))}" if extra else "")
+        )
+    schema["numeric_ranges"] = {
+        col: (hist.lo, hist.lo + hist.width * hist.bins)
+        for col, hist in state["partial"]["histograms"].items() if hist.lo is not None
+    }
+    return schema
+
+def _ignore_progress(fraction, text):
+    pass
+
+def _profile_sequential(uploaded_file, schema, total_size, progress, backend, seed=0, snapshots=None):
+    """
+    Single-process path: walks the file chunk by chunk into one partial summary.
+    Returns the parser mode actually used (see _parser_modes).
+    """
+    modes = _parser_modes(backend, schema)
+    retries = 0.0 # Time spent on attempts that had to be discarded
+    for mode in modes:
+        started = time.perf_counter()
+        try:
+            partial = _profile_stream(uploaded_file, schema, total_size, progress, mode, seed, snapshots)
+            if retries:
+                partial["timings"]["retries"] = retries
+            return partial, mode
+        except (ValueError, TypeError):
+            # A value the schema sample never showed (ArrowInvalid is a ValueError); retry more leniently
+            if mode == modes[-1]:
+                raise
+            retries += time.perf_counter() - started
+            uploaded_file.seek(0)
+
+def _parser_modes(backend, schema):
+    """
+    Parser configurations to try in order: pinned dtypes on Arrow, pandas with pinned text columns
+    (which survives stray tokens in numeric columns, see _iter_chunks), then pandas with its own
+    per-chunk inference as the last resort. A stray token thus costs Arrow one restart, and pandas none.
+    Arrow only takes global null tokens, so columns with extra NA tokens skip it.
+    """
+    modes = ["arrow"] if backend == "arrow" and not schema["na_values"] else []
+    return modes + ["pandas", "pandas-loose"]
+
+def _profile_stream(uploaded_file, schema, total_size, progress, mode, seed=0, snapshots=None):
+    partial = _new_partial(schema, seed)
+    path = _local_path(uploaded_file)
+    started = time.perf_counter()
+
+    with MappedRange(path) if path else CountingReader(uploaded_file) as reader:
+        source = _decompress(reader, schema["compression"]) if schema["compression"] else reader
+        # Iterate through chunks
+        for chunk in timed_iter(_iter_chunks(source, schema, mode), partial["timings"], "parse"):
+            _profile_chunk(partial, chunk, schema)
+
+            # Bytes the parser has pulled from the (compressed) stream: exact, and free to read
+            _report_progress(progress, partial["rows"], reader.bytes_read, total_size, started)
+            if snapshots and snapshots.due():
+                snapshots.publish(schema, partial, reader.bytes_read / max(1, total_size))
+
+    return partial
+
+def _iter_chunks(source, schema, mode):
+    """
+    Yields DataFrame chunks of a CSV stream parsed in the given mode.
+    """
+    if mode == "arrow":
+        yield from _iter_arrow_chunks(source, schema)
+    elif mode == "pandas":
+        # Numeric columns are left to the C parser's own inference rather than pinned to float64: a token
+        # the schema sample never showed then turns just that chunk's column into text, which
+        # _profile_chunk coerces, instead of failing the whole pass
+        dtypes = {c: t for c, t in schema["dtypes"].items() if t != "float64"}
+        yield from pd.read_csv(
+            source, chunksize=CHUNK_SIZE, usecols=schema["usecols"], dtype=dtypes, na_values=schema["na_values"]
+        )
+    else:
+        yield from pd.read_csv(source, chunksize=CHUNK_SIZE, usecols=schema["usecols"], low_memory=False)
+
+def _iter_arrow_chunks(source, schema):
+    """
+    Arrow streaming reader: blocks are parsed on Arrow's thread pool with the schema's pinned
+    column types, so category columns arrive dictionary-encoded instead of as object columns.
+    Small record batches are regrouped into CHUNK_SIZE-row frames to keep per-chunk overhead constant.
+    """
+    arrow_types = {"float64": pa.float64(), "category": pa.dictionary(pa.int32(), pa.string()), "str": pa.string()}
+    # Arrow reads the header raw; naming the columns as pandas did (blank cells become "Unnamed: i",
+    # duplicates "x.1") keeps include_columns and column_types aligned with the schema. Names are
+    # given by position, so they come from this file's header, not from the profile's column order
+    read_options = pa_csv.ReadOptions(
+        block_size=ARROW_BLOCK_SIZE, use_threads=True, column_names=schema["header"], skip_rows=1
+    )
+    convert_options = pa_csv.ConvertOptions(
+        # The date column stays text, as under pandas: Arrow would turn offset-aware strings into UTC
+        # timestamps and bucket them by UTC day instead of by local wall-clock day (_day_numbers)
+        column_types={c: arrow_types[t] for c, t in schema["dtypes"].items()},
+        include_columns=schema["usecols"],
+        strings_can_be_null=True # Match pandas: empty fields are missing, not ""
+    )
+    batches = pa_csv.open_csv(source, read_options=read_options, convert_options=convert_options)
+    for table in _regroup_batches(batches):
+        yield table.to_pandas(date_as_object=False)
+
+def _regroup_batches(batches):
+    """
+    Concatenates record batches into tables of at least CHUNK_SIZE rows (the last one may be smaller).
+    """
+    pending = []
+    pending_rows = 0
+    for batch in batches:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= CHUNK_SIZE:
+            yield pa.Table.from_batches(pending)
+            pending = []
+            pending_rows = 0
+    if pending:
+        yield pa.Table.from_batches(pending)
+
+def _profile_parallel(uploaded_file, schema, workers, progress, backend, seed=0, snapshots=None):
+    """
+    Multi-process path: profiles line-aligned byte ranges on a process pool with the shared
+    schema and reduces the partial summaries in file order.
+    Each worker memory-maps just its own range of the file. Any other stream (an upload) is first
+    spilled to a temporary file, so neither the parent nor the workers hold the whole file.
+    Ranges end on record boundaries even when quoted fields contain line breaks (see _split_byte_ranges).
+    """
+    path = _local_path(uploaded_file)
+    if path is not None:
+        return _profile_ranges(path, schema, workers, progress, backend, seed, snapshots)
+    with tempfile.NamedTemporaryFile(prefix="insightbridge-", suffix=".csv") as spill:
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, spill, SPILL_BLOCK_BYTES)
+        spill.flush()
+        return _profile_ranges(spill.name, schema, workers, progress, backend, seed, snapshots)
+
+def _profile_ranges(path, schema, workers, progress, backend, seed=0, snapshots=None):
+    data = _map_file(path)
+    header_end = data.find(b"\n") + 1
+    header = data[:header_end]
+    ranges = _split_byte_ranges(data, header_end, workers * RANGES_PER_WORKER)
+    total_size = len(data)
+    # Only the range boundaries were needed here; workers map the bytes themselves
+    data.close()
+    modes = _parser_modes(backend, schema)
+
+    partials = [None] * len(ranges)
+    used = [] # Parser mode each range ended up with
+    bytes_done = header_end
+    rows_done = 0
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_profile_range, header, (path, start, end), schema, modes, seed + idx + 1): idx
+            for idx, (start, end) in enumerate(ranges)
+        }
+        for future in as_completed(futures):
+            idx = futures[future]
+            try:
+                partials[idx], mode = future.result()
+            except Exception:
+                # Leave the queued ranges unparsed; the caller falls back to one stream
+                pool.shutdown(cancel_futures=True)
+                raise
+            used.append(mode)
+            start, end = ranges[idx]
+            bytes_done += end - start
+            rows_done += partials[idx]["rows"]
+            _report_progress(progress, rows_done, bytes_done, total_size, started, workers)
+            if snapshots and snapshots.due():
+                # Ranges finished so far, in any order; the final reduction below stays in file order
+                done = _new_partial(schema)
+                for other in partials:
+                    if other is not None:
+                        _merge_partials(done, other)
+                snapshots.publish(schema, done, bytes_done / max(1, total_size))
+
+    partial = _new_partial(schema)
+    with span(partial["timings"], "merge"):
+        for other in partials:
+            _merge_partials(partial, other)
+
+    # Report the most lenient mode any range needed
+    return partial, max(used, key=modes.index, default=modes[0])
+
+class _Provisional:
+    """
+    Paces the provisional summaries of one ingest (see profile_file's `provisional`). `due` is
+    checked once per chunk (per finished range in parallel mode); `publish` finalizes a copy of
+    the accumulators so far, merged onto `base` (the partial of a state being appended to).
+    """
+    def __init__(self, callback, base=None):
+        self.callback = callback
+        self.base = base
+        self.started = time.perf_counter()
+        self.next_at = self.started + PROVISIONAL_FIRST_SECONDS
+        self.chunks = 0
+        self.published = 0
+        self.seconds = 0.0 # Ingest time spent building and handing out provisional summaries
+
+    def due(self):
+        self.chunks += 1
+        return (not self.published and self.chunks >= PROVISIONAL_FIRST_CHUNKS) or time.perf_counter() >= self.next_at
+
+    def publish(self, schema, partial, fraction):
+        started = time.perf_counter()
+        if self.base is not None:
+            partial = _merge_partials(copy.deepcopy(self.base), partial)
+        summary = _finalize_summary(schema, partial)
+        self.published += 1
+        summary["provisional"] = {"snapshot": self.published, "fraction": min(fraction, 1.0), "seconds": started - self.started}
+        self.callback(summary)
+        finished = time.perf_counter()
+        self.seconds += finished - started
+        self.next_at = finished + max(PROVISIONAL_INTERVAL, (finished - started) / PROVISIONAL_OVERHEAD)
+
+class CountingReader(io.RawIOBase):
+    """
+    Read-only binary stream wrapper that counts the bytes handed to the consumer (e.g. the CSV parser).
+    """
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        n = len(data)
+        buffer[:n] = data
+        self.bytes_read += n
+        return n
+
+class MappedRange(io.RawIOBase):
+    """
+    Read-only binary stream over bytes start..end of a memory-mapped file, preceded by `prefix`
+    (a worker's range gets the CSV header). Bytes are copied from the mapping straight into the
+    parser's buffer, and pages already consumed are released from this process's resident set
+    every MAPPED_RELEASE_BYTES, so peak RSS stays near the parser's buffer size.
+    """
+    def __init__(self, path, start=0, end=None, prefix=b""):
+        self._file = open(path, "rb")
+        self._map = _map_file(path, self._file)
+        self._view = memoryview(self._map) if self._map is not None else memoryview(b"")
+        self.pos = start
+        self.end = len(self._view) if end is None else end
+        self.prefix = prefix
+        self.bytes_read = 0
+        self._released = start - start % mmap.PAGESIZE # Page-aligned start of the not yet released span
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self.prefix:
+            n = min(len(buffer), len(self.prefix))
+            buffer[:n] = self.prefix[:n]
+            self.prefix = self.prefix[n:]
+        else:
+            n = max(0, min(len(buffer), self.end - self.pos))
+            buffer[:n] = self._view[self.pos:self.pos + n]
+            self.pos += n
+            self._release_consumed()
+        self.bytes_read += n
+        return n
+
+    def _release_consumed(self):
+        done = self.pos - self.pos % mmap.PAGESIZE
+        if done - self._released >= MAPPED_RELEASE_BYTES and hasattr(mmap, "MADV_DONTNEED"):
+            # Clean file-backed pages: dropping them costs nothing, they stay in the page cache
+            self._map.madvise(mmap.MADV_DONTNEED, self._released, done - self._released)
+            self._released = done
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+        super().close()
+
+def _map_file(path, file=None):
+    """
+    Maps a file read-only for sequential access. Returns None for an empty file, which cannot be mapped.
+    """
+    if file is None:
+        with open(path, "rb") as f:
+            return _map_file(path, f)
+    if os.fstat(file.fileno()).st_size == 0:
+        return None
+    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped
+
+def _usable_cores():
+    """
+    CPUs this process may run on, which in a container or under taskset can be fewer than os.cpu_count().
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def _local_path(file_obj):
+    """
+    Path of the regular file behind a file object opened from the local filesystem, else None
+    (uploads and in-memory buffers).
+    """
+    try:
+        file_obj.fileno()
+    except (AttributeError, OSError):
+        return None
+    name = getattr(file_obj, "name", None)
+    return name if isinstance(name, str) and os.path.isfile(name) else None
+
+def _detect_format(file_obj):
+    """
+    Identifies the input from its magic bytes: "parquet", "arrow" (IPC file / Feather v2),
+    "gzip", "bz2" or "zstd" (compressed CSV), else "csv". Rewinds the file.
+    """
+    file_obj.seek(0)
+    head = file_obj.read(10)
+    file_obj.seek(0)
+    if head.startswith(b"PAR1"):
+        return "parquet"
+    if head.startswith(b"ARROW1"):
+        return "arrow"
+    for magic, codec in COMPRESSED_SIGNATURES.items():
+        # bz2 also carries a block magic after its level digit; a CSV header may well start with "BZh"
+        if head.startswith(magic) and (codec != "bz2" or head[4:10] == b"1AY&SY"):
+            return codec
+    return "csv"
+
+def _decompress(raw, compression):
+    """
+    Wraps a binary stream of compressed CSV in a streaming decompressor.
+    """
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if compression == "bz2":
+        return bz2.BZ2File(raw)
+    if zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    if pa is not None:
+        # PythonFile closes what it wraps; the CountingReader shims keep `raw` open and give pandas a RawIOBase
+        return CountingReader(pa.CompressedInputStream(pa.PythonFile(CountingReader(raw), mode="r"), "zstd"))
+    raise ImportError("zstd-compressed input needs the zstandard or pyarrow package")
+
+def list_drop_files(directory):
+    """
+    Lists profileable files under a server-side drop folder (recursively), as
+    (path relative to the folder, size in bytes) pairs sorted by path.
+    """
+    files = []
+    for root, _, names in os.walk(directory):
+        for name in names:
+            if name.lower().endswith(INPUT_EXTENSIONS):
+                path = os.path.join(root, name)
+                files.append((os.path.relpath(path, directory), os.path.getsize(path)))
+    return sorted(files)
+
+def _report_progress(progress, rows, bytes_done, total_bytes, started, workers=1):
+    """
+    Reports progress from byte position, with rows/s, MB/s and ETA in the text.
+    """
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    byte_rate = bytes_done / elapsed
+    eta = (total_bytes - bytes_done) / byte_rate if byte_rate > 0 else 0
+    cores = f" on {workers} cores" if workers > 1 else ""
+    progress(
+        min(bytes_done / max(1, total_bytes), 0.99),
+        f"Processing {rows:,} rows{cores} · {rows / elapsed:,.0f} rows/s · {byte_rate / 1e6:.1f} MB/s · ETA {eta:.0f}s"
+    )
+
+def _ingest_stats(rows, total_bytes, seconds, workers, backend):
+    """
+    Throughput counters stored in summary["ingest"] for tracking ingest performance over time.
+    """
+    seconds = max(seconds, 1e-9)
+    return {
+        "bytes": total_bytes,
+        "rows": rows,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds,
+        "mb_per_s": total_bytes / seconds / 1e6,
+        "workers": workers,
+        "backend": backend,
+        "cache_hit": False
+    }
+
+def _split_byte_ranges(data, start, n_ranges):
+    """
+    Splits data[start:] into up to n_ranges (start, end) pairs, each ending just after a newline
+    outside any quoted field. Every range starts on a record boundary, so a newline preceded by an
+    odd number of quotes since the range start lies inside a quoted field and is skipped.
+    """
+    end_of_data = len(data)
+    if start >= end_of_data:
+        return []
+
+    target = max(1, (end_of_data - start) // max(1, n_ranges))
+    ranges = []
+    pos = start
+    while pos < end_of_data:
+        cut = data.find(b"\n", min(pos + target, end_of_data) - 1)
+        quotes = _count_quotes(data, pos, end_of_data if cut == -1 else cut)
+        while cut != -1 and quotes % 2:
+            following = data.find(b"\n", cut + 1)
+            quotes += _count_quotes(data, cut, end_of_data if following == -1 else following)
+            cut = following
+        end = end_of_data if cut == -1 else cut + 1
+        ranges.append((pos, end))
+        pos = end
+    return ranges
+
+def _count_quotes(data, start, end):
+    """
+    Number of '"' bytes in data[start:end] (bytes or an mmap), counted MAPPED_RELEASE_BYTES at a
+    time. Scanned pages of a mapping are released again, as in MappedRange.
+    """
+    view = np.frombuffer(data, dtype=np.uint8)
+    count = 0
+    for lo in range(start, end, MAPPED_RELEASE_BYTES):
+        hi = min(lo + MAPPED_RELEASE_BYTES, end)
+        count += int(np.count_nonzero(view[lo:hi] == ord('"')))
+        if isinstance(data, mmap.mmap) and hasattr(mmap, "MADV_DONTNEED"):
+            first, last = lo - lo % mmap.PAGESIZE, hi - hi % mmap.PAGESIZE
+            if last > first:
+                data.madvise(mmap.MADV_DONTNEED, first, last - first)
+    del view # An exported buffer would keep the mapping from closing
+    return count
+
+def _profile_range(header, body, schema, modes=("pandas",), seed=0):
+    """
+    Worker entry point: profiles one byte range, prefixed with the CSV header, into a partial summary.
+    `body` is a (path, start, end) triple the worker memory-maps itself.
+    Returns the partial and the parser mode that succeeded. Each range needs its own seed
+    so the reservoir keys of different ranges are independent.
+    """
+    retries = 0.0
+    for mode in modes:
+        started = time.perf_counter()
+        try:
+            partial = _new_partial(schema, seed)
+            with MappedRange(*body, prefix=header) as source:
+                for chunk in timed_iter(_iter_chunks(source, schema, mode), partial["timings"], "parse"):
+                    _profile_chunk(partial, chunk, schema)
+            if retries:
+                partial["timings"]["retries"] = retries
+            return partial, mode
+        except (ValueError, TypeError):
+            if mode == modes[-1]:
+                raise
+            retries += time.perf_counter() - started
+
+def _infer_schema(uploaded_file, total_size, compression=None):
+    """
+    Schema phase: samples the head of the file plus a few windows spread through it, then decides
+    each column's role and parse dtype once, for every chunk and worker. Rewinds the file.
+    A compressed file is sampled from its decompressed head only.
+    """
+    uploaded_file.seek(0)
+    # Parsed with pandas' own inference: clean numeric columns arrive as numbers from the C parser,
+    # and only columns that come back as text need their tokens examined below
+    head = pd.read_csv(
+        _decompress(uploaded_file, compression) if compression else uploaded_file, nrows=SCHEMA_SAMPLE_ROWS, low_memory=False
+    )
+    samples = [head]
+
+    # Windows are aligned to whole lines; a window that straddles a quoted line break is skipped.
+    # They need random access, which a compressed stream does not offer, and a head shorter than
+    # SCHEMA_SAMPLE_ROWS already holds the whole file
+    if not compression and len(head) == SCHEMA_SAMPLE_ROWS and total_size > SCHEMA_WINDOW_BYTES * (SCHEMA_WINDOWS + 1):
+        for k in range(1, SCHEMA_WINDOWS + 1):
+            uploaded_file.seek(total_size * k // (SCHEMA_WINDOWS + 1))
+            window = uploaded_file.read(SCHEMA_WINDOW_BYTES)
+            first = window.find(b"\n") + 1
+            last = window.rfind(b"\n") + 1
+            if 0 < first < last:
+                try:
+                    samples.append(pd.read_csv(io.BytesIO(window[first:last]), header=None, names=list(head.columns), low_memory=False))
+                except (ValueError, pd.errors.ParserError):
+                    pass
+    uploaded_file.seek(0)
+
+    schema = _new_schema(head.columns, compression)
+    date_cols = []
+
+    # Detect types
+    sampled = pd.concat(samples, ignore_index=True) if len(samples) > 1 else head
+    for col in head.columns:
+        values = sampled[col].dropna()
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            _add_numeric_column(schema, col, values)
+            continue
+
+        # Text (or mixed): the tokens the parser will see, each distinct one coerced once
+        values = values.astype(str)
+        tokens = values.value_counts(sort=False)
+        numbers = pd.Series(pd.to_numeric(tokens.index, errors="coerce"), index=tokens.index)
+        bad = numbers.isna().to_numpy()
+        bad_tokens = tokens.index[bad]
+
+        if tokens[bad].sum() <= len(values) * NUMERIC_TOLERANCE and len(bad_tokens) <= 10:
+            _add_numeric_column(schema, col, values.map(numbers))
+            if len(bad_tokens):
+                schema["na_values"][col] = list(bad_tokens)
+        else:
+            _add_text_column(schema, col, values, date_cols)
+
+    return _finish_schema(schema, head.columns, date_cols, head.head(5))
+
+def _new_schema(columns, compression=None):
+    return {
+        "cols": len(columns),
+        "column_info": {}, # {name: pinned dtype}
+        "header": list(columns), # CSV column names in this file's order, as pandas names them
+        "sample_data": None, # First few rows for preview
+        "numeric_cols": [],
+        "numeric_centers": [], # Sample median per numeric column; centring keeps cross products well conditioned
+        "numeric_ranges": {}, # {col: (min, max)} known before reading (Parquet statistics); lays out histogram bins
+        "categorical_cols": [],
+        "segment_cols": [], # Low-cardinality categoricals grouped against every numeric column
+        "date_col": None,
+        "date_format": None, # strftime format of date_col, None when it has to be guessed per value
+        "dtypes": {}, # {name: dtype passed to the parser}
+        "na_values": {}, # {name: extra tokens read as missing in otherwise numeric columns}
+        "usecols": list(columns),
+        "compression": compression # Codec of a compressed CSV ("gzip", "bz2", "zstd"), else None
+    }
+
+def _add_numeric_column(schema, col, values):
+    # float64 is what the numeric kernel works in; narrower types would round or overflow on unseen values
+    schema["numeric_cols"].append(col)
+    schema["dtypes"][col] = "float64"
+    center = values.median()
+    schema["numeric_centers"].append(0.0 if pd.isna(center) else float(center))
+
+def _add_text_column(schema, col, values, date_cols):
+    """
+    Classifies a non-numeric column from its sampled strings: a parseable date column when its
+    name says so, else a categorical pinned as category (low cardinality) or str.
+    """
+    if "date" in col.lower() or "time" in col.lower():
+        try:
+            # Test conversion, with the format chunks will reuse when one fits
+            date_format = _infer_date_format(values)
+            pd.to_datetime(values.head(100), format=date_format or "mixed", errors='raise')
+            date_cols.append(col)
+            schema["dtypes"][col] = "str"
+            if len(date_cols) == 1:
+                schema["date_format"] = date_format
+            return
+        except (ValueError, TypeError):
+            pass
+
+    schema["categorical_cols"].append(col)
+    distinct = values.nunique()
+    low_cardinality = distinct <= CATEGORY_MAX_DISTINCT and distinct <= len(values) / 2
+    schema["dtypes"][col] = "category" if low_cardinality else "str"
+    if low_cardinality:
+        schema["segment_cols"].append(col)
+
+def _finish_schema(schema, columns, date_cols, sample):
+    if date_cols:
+        schema["date_col"] = date_cols[0]
+
+    # Columns no role profiles (extra date columns, unsupported types) are never parsed
+    profiled = set(schema["numeric_cols"] + schema["categorical_cols"] + date_cols[:1])
+    schema["usecols"] = [c for c in columns if c in profiled]
+    schema["column_info"] = {c: schema["dtypes"][c] for c in columns}
+    sample = sample.copy()
+    sample[schema["numeric_cols"]] = sample[schema["numeric_cols"]].apply(pd.to_numeric, errors="coerce")
+    schema["sample_data"] = sample
+    return schema
+
+def _profile_columnar(file_obj, input_format, total_size, progress, schema=None, seed=0, snapshots=None):
+    """
+    Parquet / Arrow IPC path: the schema comes from the file's own column types and footer
+    (unless one is given, as for appends), and only the profiled columns are ever decoded.
+    Returns the schema and the partial summary.
+    """
+    if pa is None:
+        raise ImportError("Parquet and Arrow input need pyarrow")
+    started = time.perf_counter()
+    if schema is None:
+        schema = _infer_columnar_schema(_open_columnar(file_obj, input_format), input_format)
+    partial = _new_partial(schema, seed)
+    partial["timings"]["schema"] = time.perf_counter() - started
+
+    # Reopen with the category columns decoded straight into dictionaries
+    reader = _open_columnar(file_obj, input_format, [c for c in schema["usecols"] if schema["dtypes"][c] == "category"])
+    chunks = timed_iter(_iter_columnar_chunks(reader, input_format, schema), partial["timings"], "parse")
+    for chunk, done in chunks:
+        _profile_chunk(partial, chunk, schema)
+        _report_progress(progress, partial["rows"], int(total_size * done), total_size, started)
+        if snapshots and snapshots.due():
+            snapshots.publish(schema, partial, done)
+    return schema, partial
+
+def _open_columnar(file_obj, input_format, dictionary_cols=()):
+    """
+    Opens a Parquet file (footer only) or an Arrow IPC file reader. Local files are memory-mapped,
+    so unread columns are never paged in.
+    """
+    path = _local_path(file_obj)
+    file_obj.seek(0)
+    source = pa.memory_map(path) if path else pa.PythonFile(file_obj, mode="r")
+    if input_format == "parquet":
+        return pq.ParquetFile(source, read_dictionary=list(dictionary_cols))
+    return pa_ipc.open_file(source)
+
+def _infer_columnar_schema(reader, input_format):
+    """
+    Schema phase for typed input: numeric and temporal columns are classified from their Arrow
+    types without sampling; string columns go through the CSV rules (category vs str, dates
+    stored as text) on a sample of the first rows. Nested and binary columns are not profiled.
+    Parquet min/max statistics, when every row group has them, fix the histogram ranges up front.
+    """
+    arrow_schema = reader.schema_arrow if input_format == "parquet" else reader.schema
+    columns = arrow_schema.names
+    schema = _new_schema(columns)
+    readable = [f.name for f in arrow_schema if _columnar_kind(f.type) is not None]
+    head = next(_iter_columnar_chunks(reader, input_format, {"usecols": readable, "dtypes": {}}), (None, 0))[0]
+    head = head.head(SCHEMA_SAMPLE_ROWS) if head is not None else pd.DataFrame(columns=readable)
+    date_cols = []
+
+    for field in arrow_schema:
+        kind = _columnar_kind(field.type)
+        col = field.name
+        if kind == "numeric":
+            _add_numeric_column(schema, col, pd.to_numeric(head[col], errors="coerce"))
+        elif kind == "temporal":
+            date_cols.append(col)
+            schema["dtypes"][col] = "datetime"
+        elif kind == "text":
+            _add_text_column(schema, col, head[col].dropna().astype(str), date_cols)
+        else:
+            schema["dtypes"][col] = str(field.type)
+
+    if input_format == "parquet":
+        schema["numeric_ranges"] = _parquet_ranges(reader, schema["numeric_cols"])
+    return _finish_schema(schema, columns, date_cols, head.head(5))
+
+def _columnar_kind(arrow_type):
+    if pa.types.is_dictionary(arrow_type):
+        arrow_type = arrow_type.value_type
+    if pa.types.is_integer(arrow_type) or pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+        return "numeric"
+    if pa.types.is_timestamp(arrow_type) or pa.types.is_date(arrow_type):
+        return "temporal"
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type) or pa.types.is_boolean(arrow_type):
+        return "text"
+    return None
+
+def _parquet_ranges(parquet, numeric_cols):
+    """
+    Global (min, max) per numeric column from the row-group statistics in the footer; columns
+    with a row group lacking statistics are left out.
+    """
+    metadata = parquet.metadata
+    positions = {metadata.schema.column(i).path: i for i in range(metadata.num_columns)}
+    ranges = {}
+    for col in numeric_cols:
+        lows, highs = [], []
+        for g in range(metadata.num_row_groups):
+            group = metadata.row_group(g)
+            if group.num_rows == 0:
+                continue
+            stats = group.column(positions[col]).statistics if col in positions else None
+            if stats is None or not stats.has_min_max:
+                break
+            lows.append(float(stats.min))
+            highs.append(float(stats.max))
+        else:
+            if lows:
+                ranges[col] = (min(lows), max(highs))
+    return ranges
+
+def _iter_columnar_chunks(reader, input_format, schema):
+    """
+    Yields (DataFrame, fraction of the file done) for the schema's columns only: Parquet row group
+    by row group through a projected batch reader, Arrow IPC batch by batch. Numeric columns are
+    cast to float64 and category columns dictionary-encoded inside Arrow, before pandas sees them.
+    """
+    if input_format == "parquet":
+        total = max(reader.metadata.num_rows, 1)
+        batches = reader.iter_batches(batch_size=CHUNK_SIZE, columns=schema["usecols"])
+    else:
+        total = max(reader.num_record_batches, 1)
+        batches = (reader.get_batch(i).select(schema["usecols"]) for i in range(reader.num_record_batches))
+
+    done = 0
+    for table in _regroup_batches(batches):
+        done += table.num_rows if input_format == "parquet" else len(table.to_batches())
+        for i, name in enumerate(table.column_names):
+            column, dtype = table.column(i), schema["dtypes"].get(name)
+            if dtype == "float64" and column.type != pa.float64():
+                column = column.cast(pa.float64())
+            elif dtype == "category" and not pa.types.is_dictionary(column.type):
+                column = column.dictionary_encode()
+            else:
+                continue
+            table = table.set_column(i, name, column)
+        yield table.to_pandas(date_as_object=False), min(done / total, 1.0)
+
+def _infer_date_format(values):
+    """
+    Guesses a strftime format from the first few distinct values and keeps the first one that
+    parses (nearly) all of a small probe; that winner alone is checked against the whole sample.
+    Returns None when chunks must fall back to per-value parsing.
+    """
+    values = values.dropna()
+    probe = values.iloc[::max(1, len(values) // DATE_PROBE_VALUES)] # Spread over every sample window
+    for value in probe.drop_duplicates().head(10):
+        date_format = guess_datetime_format(str(value))
+        if date_format is None:
+            continue
+        if pd.to_datetime(probe, format=date_format, errors="coerce").notna().mean() >= 1 - NUMERIC_TOLERANCE:
+            parsed = pd.to_datetime(values, format=date_format, errors="coerce")
+            return date_format if parsed.notna().mean() >= 1 - NUMERIC_TOLERANCE else None
+    return None
+
+def _new_partial(schema, seed=0):
+    """
+    Creates empty, mergeable accumulators for the columns described by schema.
+    """
+    return {
         "rows": 0,
-        "cols": 0,
-        "column_info": {}, # {name: dtype}
-        "numeric_stats": {}, # {col: {min, max, sum, sum_sq, count, missing}}
-        "categorical_stats": {}, # {col: Counter()}
+        "numeric": _new_moments(len(schema["numeric_cols"])), # Arrays aligned with schema["numeric_cols"]
+        "quantile_sketches": {col: QuantileSketch() for col in schema["numeric_cols"]}, # {col: QuantileSketch}
+        "categorical_stats": {col: CategoricalSketch() for col in schema["categorical_cols"]}, # {col: CategoricalSketch}
+        "segments": {col: _new_cube(len(schema["numeric_cols"])) for col in schema["segment_cols"]}, # {col: cube, None once too many groups}
+        "histograms": { # {col: StreamingHistogram}
+            col: StreamingHistogram(value_range=schema["numeric_ranges"].get(col)) for col in schema["numeric_cols"]
+        },
+        "cross_products": _new_cross_products(len(schema["numeric_cols"])), # {block: k x k sums} behind the correlation matrix
+        "reservoir": ReservoirSample(RESERVOIR_ROWS, seed), # Numeric and segment columns of a uniform row sample
         "missing_values": {}, # {col: count}
         "total_missing": 0,
-        "date_col": None,
-        "trend_data": {}, # {date_str: count}
+        "trend": _new_trend(len(schema["numeric_cols"])), # Record counts and numeric aggregates per day
+        "timings": {} # {stage: seconds} spent parsing and in each step of _profile_chunk
+    }
+
+def _profile_chunk(partial, chunk, schema):
+    """
+    Folds one DataFrame chunk into the partial summary in place.
+    """
+    timings = partial["timings"]
+
+    # 2. Process Numeric Cols (one 2-D block, reduced column-wise in a single kernel)
+    numeric_cols = schema["numeric_cols"]
+    block = None
+    if numeric_cols:
+        with span(timings, "numeric"):
+            numeric = chunk[numeric_cols]
+            if not all(pd.api.types.is_numeric_dtype(t) for t in numeric.dtypes):
+                # Unpinned parse: stray tokens left a numeric column as strings
+                numeric = numeric.apply(pd.to_numeric, errors="coerce")
+            block = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+            moments = _reduce_numeric_block(block)
+            _combine_moments(partial["numeric"], moments)
+
+            for j, col in enumerate(numeric_cols):
+                n_missing = int(moments["missing"][j])
+                partial["missing_values"][col] = partial["missing_values"].get(col, 0) + n_missing
+                partial["quantile_sketches"][col].update(block[:, j])
+                partial["histograms"][col].update(block[:, j])
+            partial["total_missing"] += int(moments["missing"].sum())
+        with span(timings, "correlations"):
+            _add_cross_products(partial["cross_products"], block, np.asarray(schema["numeric_centers"]))
+
+    # 3. Process Categorical Cols (Heavy hitters + distinct count in fixed memory)
+    with span(timings, "categorical"):
+        for col in schema["categorical_cols"]:
+            partial["categorical_stats"][col].update(chunk[col])
+
+            n_missing = chunk[col].isna().sum()
+            partial["missing_values"][col] = partial["missing_values"].get(col, 0) + int(n_missing)
+            partial["total_missing"] += int(n_missing)
+
+    # 4. Segment x metric cube (sum/count of every numeric column per segment value)
+    with span(timings, "segments"):
+        cubes = [col for col, cube in partial["segments"].items() if cube is not None]
+        if cubes:
+            values = _cube_values(block if block is not None else np.zeros((len(chunk), 0)))
+        for col in cubes:
+            partial["segments"][col] = _update_cube(partial["segments"][col], chunk[col], values)
+
+    # 5. Reservoir sample (numeric values as parsed above, plus segment labels), built only for
+    # the rows whose keys can still enter the sample
+    with span(timings, "reservoir"):
+        rows, keys = partial["reservoir"].select(len(chunk))
+        if len(rows):
+            sampled = dict(zip(numeric_cols, block[rows].T)) if block is not None else {}
+            for col in schema["segment_cols"]:
+                sampled[col] = chunk[col].take(rows).to_numpy()
+            partial["reservoir"].add(keys, pd.DataFrame(sampled, index=pd.RangeIndex(len(rows))))
+
+    # 6. Process Date/Trend (Volume and metrics over time)
+    if schema["date_col"]:
+        with span(timings, "dates"):
+            days, valid = _day_numbers(chunk[schema["date_col"]], schema["date_format"])
+            _add_days(partial["trend"], days[valid], block[valid] if block is not None else None)
+
+    partial["rows"] += len(chunk)
+
+def _new_moments(n_cols):
+    """
+    Creates empty per-column accumulators for count, missing, min/max, sum, mean and M2
+    (sum of squared deviations from the mean).
+    """
+    return {
+        "count": np.zeros(n_cols, dtype=np.int64),
+        "missing": np.zeros(n_cols, dtype=np.int64),
+        "min": np.full(n_cols, np.inf),
+        "max": np.full(n_cols, -np.inf),
+        "sum": np.zeros(n_cols),
+        "mean": np.zeros(n_cols),
+        "m2": np.zeros(n_cols)
+    }
+
+def _reduce_numeric_block(block):
+    """
+    Reduces a (rows x cols) float block to per-column moments in one set of column-wise passes.
+    Mean and M2 use a two-pass (centered) formula so large-magnitude columns keep their precision.
+    """
+    missing_mask = np.isnan(block)
+    missing = missing_mask.sum(axis=0)
+    count = block.shape[0] - missing
+
+    # fmin/fmax skip NaNs without warnings; all-NaN columns reduce to NaN and are ignored on combine
+    mins = np.fmin.reduce(block, axis=0) if block.shape[0] else np.full(block.shape[1], np.nan)
+    maxs = np.fmax.reduce(block, axis=0) if block.shape[0] else np.full(block.shape[1], np.nan)
+
+    filled = np.where(missing_mask, 0.0, block)
+    sums = filled.sum(axis=0)
+    safe_count = np.maximum(count, 1)
+    means = sums / safe_count
+
+    # Reuse the filled buffer for centered deviations; missing cells contribute zero
+    np.subtract(filled, means, out=filled)
+    filled[missing_mask] = 0.0
+    np.square(filled, out=filled)
+    m2 = filled.sum(axis=0)
+
+    return {"count": count, "missing": missing, "min": mins, "max": maxs, "sum": sums, "mean": means, "m2": m2}
+
+def _combine_moments(into, other):
+    """
+    Merges moments in place using Chan et al.'s parallel update for mean and M2.
+    """
+    n_a = into["count"]
+    n_b = other["count"]
+    n = n_a + n_b
+    safe_n = np.maximum(n, 1)
+    delta = other["mean"] - into["mean"]
+
+    into["mean"] = into["mean"] + delta * (n_b / safe_n)
+    into["m2"] = into["m2"] + other["m2"] + delta ** 2 * (n_a * n_b / safe_n)
+    into["sum"] = into["sum"] + other["sum"]
+    into["min"] = np.fmin(into["min"], other["min"])
+    into["max"] = np.fmax(into["max"], other["max"])
+    into["count"] = n
+    into["missing"] = into["missing"] + other["missing"]
+    return into
+
+def _day_numbers(values, date_format):
+    """
+    Parses a date column into per-row integer day numbers (days since 1970-01-01).
+    Returns the day numbers and a mask of the rows that parsed.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        codes, uniques = np.arange(len(values)), values
+    else:
+        # Timestamps repeat heavily (daily data, hourly logs); parse each distinct string once
+        codes, uniques = pd.factorize(values)
+        uniques = pd.Series(pd.to_datetime(uniques, format=date_format or "mixed", errors="coerce"))
+    if uniques.dt.tz is not None:
+        uniques = uniques.dt.tz_localize(None) # Bucket by local wall-clock day
+    # Missing values have code -1, which picks the trailing NaT
+    unique_days = np.append(uniques.to_numpy().astype("datetime64[D]"), np.datetime64("NaT", "D"))
+    days = unique_days[codes]
+    valid = ~np.isnat(days)
+    return days.astype(np.int64), valid
+
+def _new_trend(n_cols):
+    """
+    Creates an empty day axis holding only the days that occur in the data. "days" is a sorted
+    array of day numbers; row i of every other array belongs to days[i]: "records" counts rows,
+    and "count"/"sum"/"min"/"max" hold one column per numeric column.
+    """
+    trend = {"days": np.zeros(0, dtype=np.int64), "records": np.zeros(0, dtype=np.int64)}
+    for key in ("count", "sum", "min", "max"):
+        trend[key] = np.full((0, n_cols), TREND_FILL[key], dtype=np.int64 if key == "count" else np.float64)
+    return trend
+
+def _add_days(trend, days, block=None):
+    """
+    Folds rows into the trend: the chunk's distinct days are found with one np.unique, rows are
+    counted per day with a bincount and the matching rows of the numeric block (if any) summed
+    with weighted bincounts and min/maxed per day, then merged onto the trend's days.
+    Memory follows the number of distinct days, so a stray far-off date costs one row.
+    """
+    if days.size == 0:
+        return
+    keys, idx = np.unique(days, return_inverse=True)
+    n = keys.size
+    chunk = _new_trend(trend["count"].shape[1])
+    chunk["days"] = keys
+    chunk["records"] = np.bincount(idx, minlength=n)
+    for key in ("count", "sum", "min", "max"):
+        chunk[key] = np.full((n, trend[key].shape[1]), TREND_FILL[key], dtype=trend[key].dtype)
+    if block is not None:
+        present = ~np.isnan(block)
+        for j in range(block.shape[1]):
+            chunk["sum"][:, j] = np.bincount(idx, weights=np.where(present[:, j], block[:, j], 0.0), minlength=n)
+            chunk["count"][:, j] = np.bincount(idx, weights=present[:, j], minlength=n).astype(np.int64)
+        np.fmin.at(chunk["min"], idx, block)
+        np.fmax.at(chunk["max"], idx, block)
+    _merge_trend(trend, chunk)
+
+def _merge_trend(into, other):
+    """
+    Adds another trend into `into` in place, over the union of their days.
+    """
+    if other["days"].size == 0:
+        return
+    days = np.union1d(into["days"], other["days"])
+    if days.size != into["days"].size:
+        rows = np.searchsorted(days, into["days"])
+        for key, fill in TREND_FILL.items():
+            old = into[key]
+            grown = np.full((days.size,) + old.shape[1:], fill, dtype=old.dtype)
+            grown[rows] = old
+            into[key] = grown
+        into["days"] = days
+    rows = np.searchsorted(days, other["days"])
+    for key in ("records", "count", "sum"):
+        into[key][rows] += other[key]
+    into["min"][rows] = np.fmin(into["min"][rows], other["min"])
+    into["max"][rows] = np.fmax(into["max"][rows], other["max"])
+
+def _trend_to_dict(trend):
+    """
+    Renders the days that have records as {"YYYY-MM-DD": count}, in date order.
+    """
+    rows = np.flatnonzero(trend["records"])
+    labels = trend["days"][rows].astype("datetime64[D]").astype(str)
+    return dict(zip(labels.tolist(), trend["records"][rows].tolist()))
+
+def _trend_rollups(trend, numeric_cols):
+    """
+    Rolls the per-day arrays up to every granularity in TREND_GRANULARITIES.
+    Each one maps to {periods: [period start "YYYY-MM-DD"], records: [...],
+    metrics: {col: {sum, count, mean, min, max}}}, holding only periods that have records.
+    """
+    rows = np.flatnonzero(trend["records"])
+    if rows.size == 0:
+        return {}
+    days = trend["days"][rows]
+    months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    period_keys = {
+        "day": days,
+        "week": days - (days + 3) % 7, # Day 0 (1970-01-01) was a Thursday; weeks start on Monday
+        "month": months,
+        "quarter": months - months % 3
+    }
+
+    rollups = {}
+    for granularity in TREND_GRANULARITIES:
+        keys, inverse = np.unique(period_keys[granularity], return_inverse=True)
+        n = keys.size
+        unit = "datetime64[D]" if granularity in ("day", "week") else "datetime64[M]"
+        starts = keys.astype(unit).astype("datetime64[D]").astype(str)
+
+        sums = np.zeros((n, len(numeric_cols)))
+        counts = np.zeros((n, len(numeric_cols)), dtype=np.int64)
+        mins = np.full((n, len(numeric_cols)), np.inf)
+        maxs = np.full((n, len(numeric_cols)), -np.inf)
+        np.add.at(sums, inverse, trend["sum"][rows])
+        np.add.at(counts, inverse, trend["count"][rows])
+        np.fmin.at(mins, inverse, trend["min"][rows])
+        np.fmax.at(maxs, inverse, trend["max"][rows])
+        # Periods where a column had no values report NaN rather than the +/-inf fill
+        empty = counts == 0
+        mins[empty] = np.nan
+        maxs[empty] = np.nan
+        means = np.where(empty, np.nan, sums / np.maximum(counts, 1))
+
+        rollups[granularity] = {
+            "periods": starts.tolist(),
+            "records": np.bincount(inverse, weights=trend["records"][rows], minlength=n).astype(np.int64).tolist(),
+            "metrics": {
+                col: {
+                    "sum": sums[:, j].tolist(),
+                    "count": counts[:, j].tolist(),
+                    "mean": means[:, j].tolist(),
+                    "min": mins[:, j].tolist(),
+                    "max": maxs[:, j].tolist()
+                }
+                for j, col in enumerate(numeric_cols)
+            }
+        }
+    return rollups
+
+def _new_cross_products(n_cols):
+    """
+    Creates the accumulators behind the correlation matrix. For a chunk with centred values Z
+    (missing cells zeroed) and validity mask M, they hold the four blocks the correlations need:
+    cross products ZᵀZ, pairwise sums ZᵀM, pairwise sums of squares (Z²)ᵀM and pairwise valid
+    counts MᵀM, each k x k.
+    """
+    return {key: np.zeros((n_cols, n_cols)) for key in ("zz", "zm", "sqm", "mm")}
+
+def _add_cross_products(products, block, centers):
+    present = ~np.isnan(block)
+    z = np.where(present, block - centers, 0.0)
+    squares = z * z
+    products["zz"] += z.T @ z
+    if present.all():
+        # Every pair is valid on every row: the M blocks reduce to column sums and the row count
+        products["zm"] += z.sum(axis=0)[:, None]
+        products["sqm"] += squares.sum(axis=0)[:, None]
+        products["mm"] += len(block)
+        return
+    mask = present.astype(np.float64)
+    products["zm"] += z.T @ mask
+    products["sqm"] += squares.T @ mask
+    products["mm"] += mask.T @ mask
+
+def _merge_cross_products(into, other):
+    for key, block in other.items():
+        into[key] += block
+
+def _correlations(products, numeric_cols):
+    """
+    Pairwise-complete Pearson correlations from the accumulated cross products.
+    Returns {columns, matrix, top_pairs: [{a, b, r, n}] by |r|}; undefined entries are NaN.
+    """
+    k = len(numeric_cols)
+    if k < 2:
+        return {"columns": list(numeric_cols), "matrix": [], "top_pairs": []}
+    n = products["mm"] # n[i, j]: rows where both i and j are present
+    sxy = products["zz"]
+    sx = products["zm"] # sx[i, j]: sum of z_i over rows where j is present too
+    sxx = products["sqm"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = n * sxy - sx * sx.T
+        var = n * sxx - sx * sx
+        r = cov / np.sqrt(var * var.T)
+    r = np.where(n >= 2, np.clip(r, -1.0, 1.0), np.nan)
+    np.fill_diagonal(r, 1.0)
+
+    pairs = [
+        {"a": numeric_cols[i], "b": numeric_cols[j], "r": float(r[i, j]), "n": int(n[i, j])}
+        for i in range(k) for j in range(i + 1, k) if np.isfinite(r[i, j])
+    ]
+    pairs.sort(key=lambda pair: -abs(pair["r"]))
+    return {"columns": list(numeric_cols), "matrix": r.tolist(), "top_pairs": pairs[:10]}
+
+def _new_cube(n_cols):
+    """
+    Creates an empty group-by cube for one segment column: per segment value, the row count
+    and the sum and non-missing count of every numeric column. Row i of the arrays belongs to
+    the value whose slot is i.
+    """
+    return {
+        "slots": {}, # {value: row in the arrays below}, in order of first appearance
+        "rows": np.zeros(0, dtype=np.int64),
+        "sum": np.zeros((0, n_cols), dtype=np.float64), # value x numeric col
+        "count": np.zeros((0, n_cols), dtype=np.int64)
+    }
+
+def _cube_values(block):
+    """
+    Prepares a chunk's numeric block once for every segment column: the columns as contiguous
+    rows with missing values zeroed, and the (column, row) positions of the missing values.
+    """
+    values = block.T.copy() # Never a view: the block is shared with the reservoir and may be read-only
+    missing = np.isnan(values)
+    values[missing] = 0.0
+    return values, np.nonzero(missing)
+
+def _add_to_cube(cube, labels, rows, sums, counts):
+    """
+    Adds per-label aggregates into the cube, giving unseen labels new slots.
+    Returns None once the column has more than SEGMENT_MAX_GROUPS values, dropping it from the cube.
+    """
+    slots = cube["slots"]
+    at = np.array([slots.setdefault(label, len(slots)) for label in labels], dtype=np.intp)
+    if len(slots) > SEGMENT_MAX_GROUPS:
+        return None
+    grow = len(slots) - len(cube["rows"])
+    if grow:
+        cube["rows"] = np.concatenate([cube["rows"], np.zeros(grow, dtype=np.int64)])
+        for key in ("sum", "count"):
+            cube[key] = np.concatenate([cube[key], np.zeros((grow, cube[key].shape[1]), dtype=cube[key].dtype)])
+    # Labels are distinct, so each slot is written once
+    cube["rows"][at] += rows
+    cube["sum"][at] += sums
+    cube["count"][at] += counts
+    return cube
+
+def _update_cube(cube, keys, values):
+    """
+    Groups one chunk by a segment column and adds it into the cube. `values` comes from
+    _cube_values. Keys are factorized once; missing keys go to a spare group that is dropped.
+    """
+    codes, labels = pd.factorize(keys)
+    if len(labels) > SEGMENT_MAX_GROUPS:
+        return None
+    n_groups = len(labels) + 1
+    codes = np.where(codes < 0, len(labels), codes)
+    block, (missing_cols, missing_rows) = values
+    rows = np.bincount(codes, minlength=n_groups)
+    sums = np.empty((n_groups, len(block)), dtype=np.float64)
+    for j, column in enumerate(block):
+        sums[:, j] = np.bincount(codes, weights=column, minlength=n_groups)
+    missing = np.bincount(codes[missing_rows] * len(block) + missing_cols, minlength=n_groups * len(block))
+    counts = rows[:, None] - missing.reshape(n_groups, len(block))
+    # Chunks carry their own category sets; plain labels align across chunks and workers
+    labels = pd.Index(labels).astype(object)
+    return _add_to_cube(cube, labels, rows[:-1], sums[:-1], counts[:-1])
+
+def _merge_cube(into, other):
+    if into is None or other is None:
+        return None
+    return _add_to_cube(into, list(other["slots"]), other["rows"], other["sum"], other["count"])
+
+def _finalize_cube(cube, numeric_cols):
+    """
+    Renders a cube as {values, rows, metrics: {col: {sum, count, mean}}}, largest segments first.
+    """
+    slots, rows = cube["slots"], cube["rows"]
+    order = sorted(slots, key=lambda value: (-rows[slots[value]], str(value)))
+    at = np.array([slots[value] for value in order], dtype=np.intp)
+    sums, counts = cube["sum"][at], cube["count"][at]
+    means = sums / np.where(counts > 0, counts, np.nan)
+    metrics = zip(numeric_cols, sums.T.tolist(), counts.T.tolist(), means.T.tolist())
+    return {
+        "values": order,
+        "rows": rows[at].tolist(),
+        "metrics": {col: {"sum": s, "count": c, "mean": m} for col, s, c, m in metrics}
+    }
+
+def _merge_partials(into, other):
+    """
+    Reduces another partial summary into `into` in place.
+    """
+    into["rows"] += other["rows"]
+    into["total_missing"] += other["total_missing"]
+
+    for col, n_missing in other["missing_values"].items():
+        into["missing_values"][col] = into["missing_values"].get(col, 0) + n_missing
+
+    _combine_moments(into["numeric"], other["numeric"])
+
+    for col, sketch in other["quantile_sketches"].items():
+        into["quantile_sketches"][col].merge(sketch)
+
+    for col, sketch in other["categorical_stats"].items():
+        into["categorical_stats"][col].merge(sketch)
+
+    for col, hist in other["histograms"].items():
+        into["histograms"][col].merge(hist)
+
+    into["reservoir"].merge(other["reservoir"])
+    _merge_cross_products(into["cross_products"], other["cross_products"])
+
+    for col, cube in other["segments"].items():
+        into["segments"][col] = _merge_cube(into["segments"][col], cube)
+
+    _merge_trend(into["trend"], other["trend"])
+    merge_timings(into["timings"], other["timings"])
+
+    return into
+
+def _finalize_summary(schema, partial):
+    """
+    Turns schema and reduced accumulators into the summary dictionary the app consumes.
+    """
+    summary = {
+        "rows": partial["rows"],
+        "cols": schema["cols"],
+        "column_info": schema["column_info"], # {name: dtype}
+        "numeric_stats": {}, # {col: {min, max, sum, count, missing, mean, std, p1..p99}}
+        "categorical_stats": { # {col: {top: [{value, count, error}], count, distinct, distinct_exact, error_bound}}
+            col: sketch.finalize() for col, sketch in partial["categorical_stats"].items()
+        },
+        "segment_stats": { # {segment col: {values, rows, metrics: {numeric col: {sum, count, mean}}}}
+            col: _finalize_cube(cube, schema["numeric_cols"]) for col, cube in partial["segments"].items() if cube is not None
+        },
+        "histograms": {col: hist.finalize() for col, hist in partial["histograms"].items()}, # {col: {edges, counts}}
+        "correlations": _correlations(partial["cross_products"], schema["numeric_cols"]), # {columns, matrix, top_pairs}
+        "reservoir_sample": partial["reservoir"].sample(), # Up to RESERVOIR_ROWS uniformly sampled rows
+        "missing_values": dict(partial["missing_values"]), # {col: count}
+        "total_missing": partial["total_missing"],
+        "date_col": schema["date_col"],
+        "trend_data": _trend_to_dict(partial["trend"]), # {date_str: count}
+        "trend_rollups": _trend_rollups(partial["trend"], schema["numeric_cols"]), # {granularity: {periods, records, metrics}}
         "trend_type": None, # 'daily' or 'raw'
-        "sample_data": None # First few rows for preview
+        "sample_data": schema["sample_data"] # First few rows for preview
     }
-    
-    processed_first_chunk = False
-    numeric_cols = []
-    categorical_cols = []
-    date_cols = []
-    
-    # Check total size for progress bar
-    uploaded_file.seek(0, 2)
-    total_size = uploaded_file.tell()
-    uploaded_file.seek(0)
-    
-    progress_bar = st.progress(0, text="Processing data chunks...")
-    bytes_read = 0
-    
-    try:
-        # Iterate through chunks
-        for chunk in pd.read_csv(uploaded_file, chunksize=CHUNK_SIZE):
-            # Update bytes read for progress calculation (approximate)
-            bytes_read += chunk.memory_usage(deep=True).sum() # This is memory size, not file size, but good enough proxy for progress if normalized carefully or just mapped to iteration if we knew row count. 
-            # Actually, read_csv doesn't tell us bytes read easily. Let's just update progress based on a rough estimate or just keep it spinning/pulsing if precise byte tracking is hard.
-            # However, standard practice: just increment strictly. 
-            # Let's use a simpler progress update:
-            current_prog = min(bytes_read / (max(1, total_size) * 2), 0.95) # Heuristic, max 1 to avoid div by zero
-            progress_bar.progress(current_prog, text=f"Processing {summary['rows']:,} rows...")
-
-            # 1. logical type detection (only on first chunk to set schema)
-            if not processed_first_chunk:
-                summary["sample_data"] = chunk.head(5)
-                summary["cols"] = len(chunk.columns)
-                summary["column_info"] = {c: str(chunk[c].dtype) for c in chunk.columns}
-                
-                # Detect types
-                for col in chunk.columns:
-                    if pd.api.types.is_numeric_dtype(chunk[col]):
-                        numeric_cols.append(col)
-                        summary["numeric_stats"][col] = {
-                            "min": float('inf'), "max": float('-inf'), 
-                            "sum": 0.0, "sum_sq": 0.0, "count": 0, "missing": 0
-                        }
-                    elif pd.api.types.is_datetime64_any_dtype(chunk[col]):
-                         date_cols.append(col)
-                    else:
-                        # Try to detect date strings
-                        if "date" in col.lower() or "time" in col.lower():
-                            try:
-                                # Test conversion
-                                pd.to_datetime(chunk[col].head(100), errors='raise')
-                                date_cols.append(col)
-                            except:
-                                categorical_cols.append(col)
-                                summary["categorical_stats"][col] = Counter()
-                        else:
-                            categorical_cols.append(col)
-                            summary["categorical_stats"][col] = Counter()
-
-                if date_cols:
-                    summary["date_col"] = date_cols[0]
-
-                processed_first_chunk = True
-
-            # 2. Process Numeric Cols
-            for col in numeric_cols:
-                # Handle missing before conversion
-                n_missing = chunk[col].isna().sum()
-                summary["numeric_stats"][col]["missing"] += int(n_missing)
-                summary["missing_values"][col] = summary["missing_values"].get(col, 0) + int(n_missing)
-                summary["total_missing"] += int(n_missing)
-
-                # Operations on valid data
-                valid = chunk[col].dropna()
-                if not valid.empty:
-                    summary["numeric_stats"][col]["min"] = min(summary["numeric_stats"][col]["min"], valid.min())
-                    summary["numeric_stats"][col]["max"] = max(summary["numeric_stats"][col]["max"], valid.max())
-                    s = valid.sum()
-                    summary["numeric_stats"][col]["sum"] += s
-                    summary["numeric_stats"][col]["sum_sq"] += (valid ** 2).sum()
-                    summary["numeric_stats"][col]["count"] += len(valid)
-
-            # 3. Process Categorical Cols (Top N tracking)
-            for col in categorical_cols:
-                # Limit memory: only track top 50 values per chunk, then merge? 
-                # Better: just update counter, but prune if it gets too big to avoid OOM on high cardinality
-                counts = chunk[col].value_counts().head(50).to_dict() # Only keep top 50 local
-                summary["categorical_stats"][col].update(counts)
-                
-                # Prune global counter to top 50 to prevent unbounded growth
-                if len(summary["categorical_stats"][col]) > 100:
-                    summary["categorical_stats"][col] = Counter(dict(summary["categorical_stats"][col].most_common(50)))
-                    
-                n_missing = chunk[col].isna().sum()
-                summary["missing_values"][col] = summary["missing_values"].get(col, 0) + int(n_missing)
-                summary["total_missing"] += int(n_missing)
-
-            # 4. Process Date/Trend (Volume over time)
-            if summary["date_col"]:
-                d_col = summary["date_col"]
-                # Convert to datetime
-                dates = pd.to_datetime(chunk[d_col], errors='coerce').dropna()
-                if not dates.empty:
-                    # Resample to Daily counts
-                    daily_counts = dates.dt.floor('D').value_counts()
-                    for date_val, count in daily_counts.items():
-                        d_str = date_val.strftime('%Y-%m-%d')
-                        summary["trend_data"][d_str] = summary["trend_data"].get(d_str, 0) + count
-
-            summary["rows"] += len(chunk)
-
-        # Post-Processing
-        progress_bar.progress(1.0, text="Finalizing analysis...")
-        
-        # Calculate Final Numeric Stats (Mean, Std)
-        for col in numeric_cols:
-            stats = summary["numeric_stats"][col]
-            if stats["count"] > 0:
-                stats["mean"] = stats["sum"] / stats["count"]
-                # Variance = (SumSq - (Sum^2)/N) / N
-                variance = (stats["sum_sq"] - (stats["sum"]**2)/stats["count"]) / stats["count"]
-                stats["std"] = np.sqrt(variance) if variance > 0 else 0.0
-            else:
-                stats["mean"] = 0
-                stats["std"] = 0
-
-        # Sort Trend Data
-        if summary["trend_data"]:
-             sorted_dates = sorted(summary["trend_data"].keys())
-             summary["trend_sorted"] = {k: summary["trend_data"][k] for k in sorted_dates}
-             # determine range
-             summary["date_range"] = f"{sorted_dates[0]} to {sorted_dates[-1]}"
+
+    # Calculate Final Numeric Stats (Mean, Std, Percentiles)
+    moments = partial["numeric"]
+    for j, col in enumerate(schema["numeric_cols"]):
+        count = int(moments["count"][j])
+        stats = {
+            "min": float(moments["min"][j]),
+            "max": float(moments["max"][j]),
+            "sum": float(moments["sum"][j]),
+            "count": count,
+            "missing": int(moments["missing"][j])
+        }
+        estimates = partial["quantile_sketches"][col].quantiles(list(QUANTILES.values()))
+        stats.update(zip(QUANTILES.keys(), estimates))
+        if count > 0:
+            stats["mean"] = float(moments["mean"][j])
+            # Population variance from the merged sum of squared deviations
+            stats["std"] = float(np.sqrt(moments["m2"][j] / count))
         else:
-            summary["date_range"] = "N/A"
-            summary["trend_sorted"] = {}
+            stats["mean"] = 0
+            stats["std"] = 0
+        summary["numeric_stats"][col] = stats
 
-        progress_bar.empty()
-        return summary
+    # Sort Trend Data
+    if summary["trend_data"]:
+        sorted_dates = sorted(summary["trend_data"].keys())
+        summary["trend_sorted"] = {k: summary["trend_data"][k] for k in sorted_dates}
+        # determine range
+        summary["date_range"] = f"{sorted_dates[0]} to {sorted_dates[-1]}"
+    else:
+        summary["date_range"] = "N/A"
+        summary["trend_sorted"] = {}
 
-    except Exception as e:
-        progress_bar.empty()
-        st.error(f"Error processing file: {e}")
-        return None
+    return summary
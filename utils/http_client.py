@@ -0,0 +1,145 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class InferenceClient:
+    """
+    Pooled HTTP client for the inference backend, meant to be shared by the whole process.
+    Keeps connections alive across calls, caps concurrent requests, retries transient failures
+    (503 "model loading", 429, connection resets) with jittered exponential backoff that honours
+    Retry-After, and never exceeds an overall latency budget per call.
+    """
+    def __init__(self, pool_size=16, max_concurrency=8, max_retries=4,
+                 backoff_base=0.5, backoff_max=10.0, request_timeout=25.0, latency_budget=25.0):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = request_timeout
+        self.latency_budget = latency_budget
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post_json(self, url, payload, headers=None, budget=None):
+        """
+        POSTs a JSON payload and returns the decoded JSON response.
+        Raises requests.Timeout once the budget (seconds, default latency_budget) is spent.
+        """
+        deadline = time.monotonic() + (budget if budget is not None else self.latency_budget)
+        response = self._send(url, payload, headers, deadline)
+        return response.json()
+
+    def stream_events(self, url, payload, headers=None, budget=None):
+        """
+        POSTs a JSON payload to a server-sent-events endpoint and yields each decoded `data:` event.
+        Retries apply only until the response starts. Closing the generator closes the connection,
+        which tells the server to stop generating. The stream holds one of the max_concurrency
+        permits until then.
+        """
+        deadline = time.monotonic() + (budget if budget is not None else self.latency_budget)
+        response = self._send(url, payload, headers, deadline, stream=True) # Returned holding a permit
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if time.monotonic() > deadline:
+                    raise requests.Timeout("Latency budget exhausted while streaming")
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    return
+                yield json.loads(data)
+        finally:
+            response.close()
+            self._semaphore.release()
+
+    def _send(self, url, payload, headers, deadline, stream=False):
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._semaphore.acquire(timeout=remaining):
+                raise requests.Timeout(f"Latency budget exhausted after {attempt} attempts")
+            response = None
+            try:
+                remaining = max(0.001, deadline - time.monotonic())
+                response = self.session.post(
+                    url, headers=headers, json=payload, timeout=min(self.request_timeout, remaining), stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+            finally:
+                # A stream that is about to be returned keeps its permit until the reader closes it
+                # (stream_events); the body is still arriving and counts against max_concurrency
+                if not (stream and response is not None and response.ok):
+                    self._semaphore.release()
+
+            if response is not None and (response.status_code not in RETRY_STATUSES or attempt >= self.max_retries):
+                response.raise_for_status()
+                return response
+
+            delay = self._retry_delay(response, attempt)
+            if time.monotonic() + delay >= deadline:
+                if response is not None:
+                    response.raise_for_status()
+                raise requests.Timeout(f"Latency budget exhausted after {attempt + 1} attempts")
+            if response is not None:
+                response.close() # Hand the connection back to the pool before waiting
+            time.sleep(delay)
+            attempt += 1
+
+    async def post_json_async(self, url, payload, headers=None, budget=None):
+        """
+        asyncio entry point: runs post_json on a worker thread so several requests can be
+        awaited together (e.g. with asyncio.gather) while sharing the same connection pool.
+        """
+        return await asyncio.to_thread(self.post_json, url, payload, headers, budget)
+
+    def _retry_delay(self, response, attempt):
+        # Server hints win: Retry-After (seconds or HTTP date), then HF's "estimated_time"
+        if response is not None:
+            hint = _parse_retry_after(response.headers.get("Retry-After"))
+            if hint is None:
+                try:
+                    hint = float(response.json().get("estimated_time"))
+                except (ValueError, TypeError, AttributeError):
+                    hint = None
+            if hint is not None:
+                return min(max(0.0, hint), self.backoff_max)
+        # Full jitter keeps concurrent sessions from retrying in lockstep
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+def _parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+def get_default_client():
+    """
+    Returns the process-wide InferenceClient, creating it on first use.
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = InferenceClient()
+        return _default_client
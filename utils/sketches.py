@@ -0,0 +1,338 @@
+import pandas as pd
+import numpy as np
+
+class HeavyHitters:
+    """
+    Misra-Gries frequent-items summary with a fixed number of counters.
+    Counts are lower bounds; each true count is at most `error_bound()` higher.
+    Summaries merge losslessly with respect to that guarantee (Agarwal et al., "Mergeable Summaries").
+    """
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype="int64") # {value: count}
+        self.total = 0 # Every item ever offered, tracked or not
+
+    def update_counts(self, counts):
+        """
+        Folds a Series of pre-aggregated {value: count} pairs (e.g. a chunk's value_counts) into the summary.
+        """
+        counts = counts[counts > 0]
+        if counts.empty:
+            return
+        self.total += int(counts.sum())
+        self.counts = self.counts.add(counts, fill_value=0).astype("int64")
+        self._reduce()
+
+    def merge(self, other):
+        self.total += other.total
+        self.counts = self.counts.add(other.counts, fill_value=0).astype("int64")
+        self._reduce()
+        return self
+
+    def _reduce(self):
+        # Subtract the (k+1)-th largest counter from all and drop the ones that hit zero
+        if len(self.counts) > self.capacity:
+            threshold = self.counts.nlargest(self.capacity + 1).iloc[-1]
+            self.counts = self.counts[self.counts > threshold] - threshold
+
+    def error_bound(self):
+        """
+        Maximum amount by which any reported count can undershoot the true count.
+        """
+        return (self.total - int(self.counts.sum())) / (self.capacity + 1)
+
+    def most_common(self, n=None):
+        top = self.counts.nlargest(n) if n is not None else self.counts.sort_values(ascending=False)
+        return [(value, int(count)) for value, count in top.items()]
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct-count estimator over 64-bit hashes. 2**p one-byte registers;
+    relative standard error is about 1.04 / sqrt(2**p) (0.8% at the default p=14).
+    """
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, values):
+        """
+        Adds the values of a Series. Duplicates are harmless, so callers may pass uniques only.
+        """
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+        self.update_hashes(hashes)
+
+    def update_hashes(self, hashes):
+        p = self.p
+        idx = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        # Rank = position of the leftmost 1-bit in the remaining 64-p bits
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = np.where(rest == 0, 64 - p + 1, 64 - p - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def estimate(self):
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Small-range correction: linear counting is more accurate while registers are still empty
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return raw
+
+class CategoricalSketch:
+    """
+    Bounded-memory profile of one categorical column: heavy hitters plus distinct count.
+    """
+    def __init__(self, capacity=256, p=14):
+        self.heavy_hitters = HeavyHitters(capacity)
+        self.distinct = HyperLogLog(p)
+
+    def update(self, series):
+        """
+        Folds one chunk of the column in with a single vectorized value_counts.
+        """
+        counts = series.value_counts()
+        counts = counts[counts > 0]
+        if isinstance(counts.index, pd.CategoricalIndex):
+            # Dictionary-encoded chunks: merge on the plain values, not on per-chunk categories
+            counts.index = counts.index.astype(object)
+        self.heavy_hitters.update_counts(counts)
+        self.distinct.update(pd.Series(counts.index))
+
+    def merge(self, other):
+        self.heavy_hitters.merge(other.heavy_hitters)
+        self.distinct.merge(other.distinct)
+        return self
+
+    def finalize(self, top_n=50):
+        """
+        Returns plain data: top values with error bounds, non-null count and cardinality estimate.
+        """
+        error = self.heavy_hitters.error_bound()
+        tracked = self.heavy_hitters.most_common(top_n)
+        # Until the first reduction every value is tracked, so counts and cardinality are exact
+        exact = error == 0
+        distinct = len(self.heavy_hitters.counts) if exact else int(round(self.distinct.estimate()))
+        return {
+            "top": [{"value": value, "count": count, "error": error} for value, count in tracked],
+            "count": self.heavy_hitters.total,
+            "distinct": distinct,
+            "distinct_exact": exact,
+            "error_bound": error
+        }
+
+class QuantileSketch:
+    """
+    KLL quantile sketch over floats. Level h holds items of weight 2**h; a level that outgrows its
+    capacity is sorted and every other item (random offset) is promoted to the next level.
+    Memory stays around 3k items per column; rank error is roughly 1.7 / k.
+    """
+    def __init__(self, k=1000, seed=0):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self.rng = np.random.default_rng(seed)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def update(self, values):
+        """
+        Inserts a batch of values (NaNs are ignored). Large batches are sorted once and halved
+        down to a single level before joining the sketch, so a chunk costs one sort.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.count += values.size
+
+        level = 0
+        if values.size > self._capacity(0):
+            values = np.sort(values)
+            while values.size > self.k:
+                values = values[self.rng.integers(2)::2]
+                level += 1
+
+        while len(self.levels) <= level:
+            self.levels.append(np.empty(0))
+        self.levels[level] = np.concatenate([self.levels[level], values])
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+        return self
+
+    def _compress(self):
+        while True:
+            over = [h for h in range(len(self.levels)) if self.levels[h].size > self._capacity(h)]
+            if not over:
+                return
+            h = over[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(self.levels[h])
+            # An odd item out stays behind so the promoted weight is exact
+            leftover = items[:items.size % 2]
+            items = items[items.size % 2:]
+            self.levels[h] = leftover
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], items[self.rng.integers(2)::2]])
+
+    def quantiles(self, qs):
+        """
+        Returns the approximate value at each rank fraction in qs (NaN if the sketch is empty).
+        """
+        if self.count == 0:
+            return [float('nan')] * len(qs)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(lvl.size, 2.0 ** h) for h, lvl in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        cum_weights = np.cumsum(weights[order])
+        ranks = np.asarray(qs) * cum_weights[-1]
+        idx = np.minimum(np.searchsorted(cum_weights, ranks, side="left"), items.size - 1)
+        return [float(v) for v in items[order][idx]]
+
+class ReservoirSample:
+    """
+    Uniform fixed-size row sample (bottom-k): every row draws a random key and the `capacity`
+    rows with the smallest keys are kept. Rows that cannot beat the current largest key are
+    discarded in one vectorized comparison, and two samples merge by the same rule.
+    """
+    def __init__(self, capacity=50_000, seed=0):
+        self.capacity = capacity
+        self.keys = np.empty(0)
+        self.rows = None # DataFrame aligned with keys
+        self.rng = np.random.default_rng(seed)
+
+    def update(self, frame):
+        rows, keys = self.select(len(frame))
+        self.add(keys, frame.iloc[rows])
+
+    def select(self, n):
+        """
+        Draws keys for n incoming rows and returns (rows, keys): the positions of the rows that can
+        still enter the sample, and their keys. Callers build just those rows and pass them to add(),
+        so rows that lose never have to be materialized.
+        """
+        keys = self.rng.random(n)
+        if self.keys.size < self.capacity:
+            return np.arange(n), keys
+        rows = np.flatnonzero(keys < self.keys.max())
+        return rows, keys[rows]
+
+    def add(self, keys, frame):
+        self._absorb(keys, frame.reset_index(drop=True))
+
+    def merge(self, other):
+        if other.rows is not None:
+            self._absorb(other.keys, other.rows)
+
+    def _absorb(self, keys, rows):
+        if keys.size == 0:
+            return
+        if self.rows is not None:
+            keys = np.concatenate([self.keys, keys])
+            rows = pd.concat([self.rows, rows], ignore_index=True)
+        if keys.size > self.capacity:
+            keep = np.argpartition(keys, self.capacity - 1)[:self.capacity]
+            keys = keys[keep]
+            rows = rows.iloc[keep].reset_index(drop=True)
+        self.keys = keys
+        self.rows = rows
+
+    def sample(self):
+        """
+        Returns the sampled rows in a stable (key) order.
+        """
+        if self.rows is None:
+            return pd.DataFrame()
+        return self.rows.iloc[np.argsort(self.keys, kind="stable")].reset_index(drop=True)
+
+class StreamingHistogram:
+    """
+    Fixed-bin-count histogram over floats. Bins are laid out over the range of the first batch,
+    or over `value_range` when the (min, max) is known up front (e.g. from Parquet statistics);
+    values outside the range widen it by doubling the bin width and pairing up existing bins,
+    so counts are never re-binned approximately within one stream.
+    """
+    def __init__(self, bins=128, value_range=None):
+        self.bins = bins # Kept even so pairs of bins always merge cleanly
+        self.lo = None
+        self.width = None
+        self.counts = np.zeros(bins, dtype=np.int64)
+        if value_range is not None:
+            self._lay_out(*value_range)
+
+    def update(self, values):
+        """
+        Adds a batch of values; NaNs and infinities are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if values.size == 0:
+            return
+        lo, hi = values.min(), values.max()
+        if self.lo is None:
+            self._lay_out(lo, hi)
+        self._cover(lo, hi)
+        idx = ((values - self.lo) / self.width).astype(np.int64)
+        self.counts += np.bincount(np.clip(idx, 0, self.bins - 1), minlength=self.bins)
+
+    def _lay_out(self, lo, hi):
+        self.lo = lo
+        self.width = (hi - lo) / self.bins if hi > lo else (abs(lo) or 1.0) / self.bins
+
+    def _cover(self, lo, hi):
+        while lo < self.lo or hi > self.lo + self.width * self.bins:
+            self._double(downwards=lo < self.lo)
+
+    def _double(self, downwards=False):
+        paired = self.counts.reshape(-1, 2).sum(axis=1)
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        if downwards:
+            # The old range becomes the upper half
+            self.lo -= self.width * self.bins
+            self.counts[self.bins // 2:] = paired
+        else:
+            self.counts[:self.bins // 2] = paired
+        self.width *= 2
+
+    def merge(self, other):
+        if other.lo is None:
+            return
+        if self.lo is None:
+            self.lo, self.width, self.counts = other.lo, other.width, other.counts.copy()
+            return
+        # Independent streams have unrelated grids: widen to at least the other's bin width and
+        # range, then drop its counts in at their bin centres. A stream laid out over this one's
+        # range shares its grid (up to rounding of the width), so its counts land bin for bin
+        while self.width < other.width * (1 - 1e-9):
+            self._double()
+        centres = other.lo + other.width * (np.arange(other.bins) + 0.5)
+        self._cover(centres[0], centres[-1])
+        idx = np.clip(((centres - self.lo) / self.width).astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(idx, weights=other.counts, minlength=self.bins).astype(np.int64)
+
+    def finalize(self):
+        """
+        Returns {edges, counts} with empty bins at either end trimmed.
+        """
+        if self.lo is None:
+            return {"edges": [], "counts": []}
+        filled = np.flatnonzero(self.counts)
+        first, last = filled[0], filled[-1] + 1
+        edges = self.lo + self.width * np.arange(first, last + 1)
+        return {"edges": edges.tolist(), "counts": self.counts[first:last].tolist()}
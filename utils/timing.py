@@ -0,0 +1,121 @@
+"""
+Lightweight stage timing for the hot paths: profiling, AI analysis and chart construction.
+
+Timings are plain {stage: seconds} dicts, so they travel inside partial summaries and merge
+by addition like every other accumulator. Finished runs are logged as one JSON line each on
+the "insightbridge.timing" logger.
+
+Set INSIGHTBRIDGE_PROFILE to a directory to also capture a cProfile of each profiled run
+(profile_file, profile_state, AIEngine.analyze_dataset_context) as <name>-<timestamp>-<pid>.prof there;
+inspect with `python -m pstats <file>`. Unset, the hook costs one environment lookup per run.
+"""
+import contextvars
+import cProfile
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = "INSIGHTBRIDGE_PROFILE"
+
+logger = logging.getLogger("insightbridge.timing")
+_active = contextvars.ContextVar("insightbridge_timings", default=None)
+_profiling = contextvars.ContextVar("insightbridge_profiling", default=False) # Inside a @profiled call
+
+@contextmanager
+def span(timings, stage):
+    """
+    Adds the block's wall time to timings[stage].
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+def timed_iter(iterable, timings, stage):
+    """
+    Yields from `iterable`, adding the time spent producing each item (e.g. parsing a chunk) to timings[stage].
+    """
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+        yield item
+
+def merge_timings(into, other):
+    for stage, seconds in other.items():
+        into[stage] = into.get(stage, 0.0) + seconds
+    return into
+
+@contextmanager
+def collecting(timings):
+    """
+    Routes the spans of @timed functions called inside the block (e.g. one Streamlit script run) to `timings`.
+    """
+    token = _active.set(timings)
+    try:
+        yield timings
+    finally:
+        _active.reset(token)
+
+def timed(stage):
+    """
+    Decorator: adds the function's wall time to the collector of the enclosing collecting() block.
+    Outside of one, the call goes straight through.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            timings = _active.get()
+            if timings is None:
+                return fn(*args, **kwargs)
+            with span(timings, stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def log_timings(event, timings, **fields):
+    """
+    Emits one structured (JSON) log record for a finished run.
+    """
+    if logger.isEnabledFor(logging.INFO):
+        record = {"event": event, **fields, "stages": {stage: round(seconds, 6) for stage, seconds in timings.items()}}
+        logger.info(json.dumps(record, default=str))
+
+def profiled(name):
+    """
+    Decorator: captures a cProfile of each call to PROFILE_ENV's directory when that variable is set.
+    Only the outermost profiled call is captured: a nested one (profile_file calling profile_state)
+    runs inside its caller's profile, since enabling a second profiler would silently replace the first.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            directory = os.environ.get(PROFILE_ENV)
+            if not directory or _profiling.get():
+                return fn(*args, **kwargs)
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError: # A profiler from outside this module is already running (Python 3.12+)
+                return fn(*args, **kwargs)
+            token = _profiling.set(True)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _profiling.reset(token)
+                profiler.disable()
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.prof")
+                profiler.dump_stats(path)
+                logger.info(json.dumps({"event": "profile_saved", "name": name, "path": path}))
+        return wrapper
+    return decorate